@@ -0,0 +1,78 @@
+import argparse
+import io
+import json
+import time
+
+from yapep.ast import Visitor
+from yapep.ndjson import export_ndjson
+from yapep.parser import Parser
+from yapep.tokenizer import Tokenizer, iter_tokens
+from .corpus import generate
+
+
+class _JsonConverter(Visitor):
+    # the Readme's JsonConverter, as the baseline
+    def __init__(self):
+        self.result = {}
+        self.current_interchange = None
+        self.current_message = None
+
+    def visit_file(self, file):
+        self.result = {"interchanges": []}
+
+    def visit_interchange(self, interchange):
+        self.current_interchange = {"header": _segment(interchange.header), "messages": [],
+                                    "trailer": _segment(interchange.trailer)}
+        self.result["interchanges"].append(self.current_interchange)
+
+    def visit_message(self, message):
+        self.current_message = {"header": _segment(message.header), "segments": [],
+                                "trailer": _segment(message.trailer)}
+        self.current_interchange["messages"].append(self.current_message)
+
+    def visit_segment(self, segment):
+        self.current_message["segments"].append(_segment(segment))
+
+
+def _segment(segment):
+    return {"tag": segment.tag,
+            "elements": [{"components": [c.value for c in e.components]} for e in segment.elements]}
+
+
+def _visitor(data: bytes):
+    converter = _JsonConverter()
+    Parser(Tokenizer(data.decode('latin-1')).tokenize()).parse().accept(converter)
+    json.dumps(converter.result)
+
+
+def _stream(data: bytes):
+    export_ndjson(Tokenizer.from_buffer(data).tokenize_stream(), io.BytesIO())
+
+
+def _chunked(data: bytes):
+    export_ndjson(iter_tokens(io.BytesIO(data)), io.BytesIO())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EDI to JSON throughput")
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--segments', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = generate(interchanges=4, messages=args.messages // 4, segments=args.segments).encode('latin-1')
+    print(f"{len(data) / 1e6:.1f} MB, {args.messages} messages")
+    print(f"{'method':>24} {'seconds':>8} {'MB/s':>7}")
+    for name, run in (("AST + visitor + dumps", _visitor), ("TokenStream -> NDJSON", _stream),
+                      ("iter_tokens -> NDJSON", _chunked)):
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            run(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>24} {best:>8.3f} {len(data) / 1e6 / best:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
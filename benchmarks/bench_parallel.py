@@ -0,0 +1,40 @@
+import argparse
+import os
+import tempfile
+import time
+
+from yapep.parallel import parse_parallel
+from .corpus import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="parse_parallel scaling with worker count")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--segments', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    data = generate(interchanges=4, messages=args.messages // 4, segments=args.segments).encode('latin-1')
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'corpus.edi')
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        cores = os.cpu_count() or 1
+        counts = sorted({1, 2, 4, 8, cores} & set(range(1, cores + 1)))
+        print(f"{len(data) / 1e6:.1f} MB, {args.messages} messages, {cores} cores")
+        print(f"{'workers':>7} {'seconds':>8} {'MB/s':>7} {'speedup':>7}")
+        baseline = None
+        for workers in counts:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                parse_parallel(path, workers=workers)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            baseline = baseline or best
+            print(f"{workers:>7} {best:>8.3f} {len(data) / 1e6 / best:>7.1f} {baseline / best:>7.2f}")
+
+
+if __name__ == '__main__':
+    main()
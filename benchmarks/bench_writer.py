@@ -0,0 +1,37 @@
+import argparse
+import io
+import time
+
+from yapep.parser import Parser
+from yapep.tokenizer import Tokenizer
+from yapep.writer import Writer
+from .corpus import generate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writer throughput")
+    parser.add_argument('--messages', type=int, default=100000)
+    parser.add_argument('--segments', type=int, default=6)
+    parser.add_argument('--release-density', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    text = generate(interchanges=4, messages=args.messages // 4, segments=args.segments,
+                    release_density=args.release_density)
+    edi_file = Parser(Tokenizer(text).tokenize_stream()).parse()
+    print(f"{len(text) / 1e6:.1f} MB, {args.messages} messages of {args.segments + 3} segments")
+    print(f"{'sink':>8} {'seconds':>8} {'MB/s':>7} {'messages/s':>11}")
+    for name, sink in (("text", io.StringIO), ("bytes", io.BytesIO)):
+        best = None
+        for _ in range(args.repeat):
+            out = sink()
+            start = time.perf_counter()
+            with Writer(out) as writer:
+                writer.write(edi_file)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        print(f"{name:>8} {best:>8.3f} {len(text) / 1e6 / best:>7.1f} {args.messages / best:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+import random
+import string
+
+from yapep.tokenizer import Delimiters
+
+_ALPHABET = string.ascii_uppercase + string.digits
+_PLAIN_TAGS = ("UNB", "UNH", "BGM", "UNT", "UNZ")  # envelope segments, never escaped
+
+
+def generate(interchanges: int = 1, messages: int = 100, segments: int = 20, seed: int = 0,
+             elements: int | None = None, components: int = 1, release_density: float = 0.0,
+             delimiters: Delimiters | None = None) -> str:
+    # Deterministic synthetic interchanges. By default the message bodies
+    # are a mix of INVOIC-like NAD/LIN/QTY/MOA segments; with elements set,
+    # every body segment is a generic one with that many elements of
+    # components components each. release_density is the share of values
+    # holding an escaped terminator or release character.
+    rng = random.Random(seed)
+    component, element, _, release, _, terminator = delimiters = delimiters or Delimiters()
+
+    def value(text: str) -> str:
+        if release_density and rng.random() < release_density:
+            cut = rng.randrange(len(text) + 1)
+            return text[:cut] + release + rng.choice((terminator, release)) + text[cut:]
+        return text
+
+    def seg(tag: str, *fields) -> str:
+        # fields are elements, given as a str or a tuple of components;
+        # only values of the generated body segments are escaped
+        escape = value if tag not in _PLAIN_TAGS else str
+        body = element.join(
+            component.join(map(escape, field)) if isinstance(field, tuple) else escape(field)
+            for field in fields
+        )
+        return tag + element + body + terminator
+
+    parts = ["UNA" + ''.join(delimiters)]
+    for i in range(interchanges):
+        parts.append(seg("UNB", ("UNOC", "3"), ("SENDER", "14"), ("RECEIVER", "14"), ("240101", "1200"), str(i + 1)))
+        for m in range(messages):
+            parts.append(seg("UNH", str(m + 1), ("INVOIC", "D", "96A", "UN")))
+            parts.append(seg("BGM", "380", str(rng.randrange(10 ** 8)), "9"))
+            for s in range(segments):
+                if elements is not None:
+                    parts.append(seg("FTX", *(
+                        tuple(''.join(rng.choices(_ALPHABET, k=rng.randrange(1, 12))) for _ in range(components))
+                        for _ in range(elements)
+                    )))
+                    continue
+                kind = rng.randrange(4)
+                if kind == 0:
+                    parts.append(seg("NAD", "BY", (str(rng.randrange(10 ** 13)), "", "9")))
+                elif kind == 1:
+                    parts.append(seg("LIN", str(s + 1), "", (str(rng.randrange(10 ** 13)), "SRS")))
+                elif kind == 2:
+                    parts.append(seg("QTY", ("47", str(rng.randrange(1, 1000)), "PCE")))
+                else:
+                    parts.append(seg("MOA", ("77", f"{rng.randrange(100000)}.{rng.randrange(100):02d}")))
+            parts.append(seg("UNT", str(segments + 3), str(m + 1)))
+        parts.append(seg("UNZ", str(messages), str(i + 1)))
+    return ''.join(parts)
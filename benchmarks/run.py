@@ -0,0 +1,167 @@
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+from yapep.ast import Visitor
+from yapep.parser import Parser
+from yapep.tokenizer import Tokenizer, TokenType, Delimiters
+from .corpus import generate
+
+
+class _Components(Visitor):
+    # overrides the deepest level, so accept() walks the whole tree
+    def __init__(self):
+        self.count = 0
+
+    def visit_component(self, component):
+        self.count += 1
+
+
+def _cases(text: str) -> List[Tuple[str, Callable[[], None], Callable[[], object]]]:
+    # (name, setup, run): setup builds the input outside the timed part
+    # and returns the argument passed to run
+    tokens = Tokenizer(text).tokenize()
+    stream = Tokenizer(text).tokenize_stream()
+    edi_file = Parser(tokens).parse()
+    return [
+        ("tokenize", lambda: text, lambda data: Tokenizer(data).tokenize()),
+        ("tokenize_stream", lambda: text, lambda data: Tokenizer(data).tokenize_stream()),
+        ("parse", lambda: tokens, lambda data: Parser(data).parse()),
+        ("parse_stream", lambda: stream, lambda data: Parser(data).parse()),
+        ("accept", lambda: edi_file, lambda data: data.accept(_Components())),
+    ]
+
+
+def measure(text: str, repeat: int = 3) -> Dict[str, Dict[str, float]]:
+    size = len(text.encode('latin-1', 'replace'))
+    stream = Tokenizer(text).tokenize_stream()
+    tokens = len(stream)
+    segments = stream.types.count(TokenType.SEGMENT_TAG.value)
+    results = {}
+    for name, setup, run in _cases(text):
+        argument = setup()
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run(argument)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        # peak in a separate run, tracemalloc slows allocation down a lot
+        tracemalloc.start()
+        try:
+            run(argument)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        results[name] = {
+            "seconds": best,
+            "tokens_per_s": tokens / best,
+            "segments_per_s": segments / best,
+            "mb_per_s": size / 1e6 / best,
+            "peak_mb": peak / 1e6,
+        }
+    return results
+
+
+def footprint(text: str) -> Dict[str, float]:
+    # bytes the parsed tree keeps alive per segment, eager and flattened
+    tokens = Tokenizer(text).tokenize()
+    results = {}
+    for mode, flatten in (("eager", False), ("flatten", True)):
+        tracemalloc.start()
+        try:
+            edi_file = Parser(tokens, flatten=flatten).parse()
+            allocated, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        segments = sum(len(m.segments) for i in edi_file.interchanges for m in i.messages)
+        results[mode] = allocated / segments
+        del edi_file
+    return results
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            tolerance: float, tree: Dict[str, float] | None = None,
+            baseline_tree: Dict[str, float] | None = None) -> List[str]:
+    # cases whose throughput fell or whose peak memory grew by more than tolerance
+    regressions = []
+    for mode, current in (tree or {}).items():
+        previous = (baseline_tree or {}).get(mode)
+        if previous is not None and current > previous * (1 + tolerance):
+            regressions.append(f"{mode} tree: {current:.0f} bytes/segment, baseline {previous:.0f}")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["mb_per_s"] < previous["mb_per_s"] * (1 - tolerance):
+            regressions.append(f"{name}: {current['mb_per_s']:.2f} MB/s, baseline {previous['mb_per_s']:.2f}")
+        if current["peak_mb"] > previous["peak_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak {current['peak_mb']:.1f} MB, baseline {previous['peak_mb']:.1f}")
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="tokenizer, parser and traversal throughput")
+    parser.add_argument('--interchanges', type=int, default=4)
+    parser.add_argument('--messages', type=int, default=500, help="per interchange")
+    parser.add_argument('--segments', type=int, default=20, help="body segments per message")
+    parser.add_argument('--elements', type=int, default=None, help="generic segments with this many elements")
+    parser.add_argument('--components', type=int, default=1, help="components per generic element")
+    parser.add_argument('--release-density', type=float, default=0.0)
+    parser.add_argument('--delimiters', default=None, help="six UNA characters, e.g. ':+.? \\''")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', help="JSON file from --save to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="allowed relative regression")
+    parser.add_argument('--save', help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.delimiters is not None and len(args.delimiters) != 6:
+        parser.error("--delimiters needs exactly six characters")
+    corpus = {
+        "interchanges": args.interchanges, "messages": args.messages, "segments": args.segments,
+        "elements": args.elements, "components": args.components,
+        "release_density": args.release_density, "delimiters": args.delimiters, "seed": args.seed,
+    }
+    delimiters = Delimiters(*args.delimiters) if args.delimiters else None
+    text = generate(args.interchanges, args.messages, args.segments, args.seed, args.elements,
+                    args.components, args.release_density, delimiters)
+    results = measure(text, args.repeat)
+    tree = footprint(text)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"{len(text) / 1e6:.1f} MB")
+    print(f"{'case':>16} {'seconds':>8} {'tokens/s':>11} {'segments/s':>11} {'MB/s':>7} {'peak MB':>8}")
+    for name, r in results.items():
+        print(f"{name:>16} {r['seconds']:>8.3f} {r['tokens_per_s']:>11.0f} {r['segments_per_s']:>11.0f} "
+              f"{r['mb_per_s']:>7.2f} {r['peak_mb']:>8.1f}")
+    print(f"{'tree':>16} {'bytes/segment':>14} {'baseline':>9}")
+    for mode, per_segment in tree.items():
+        previous = baseline.get("tree", {}).get(mode) if baseline else None
+        reference = f"{previous:>9.0f}" if previous is not None else f"{'-':>9}"
+        print(f"{mode:>16} {per_segment:>14.0f} {reference}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"corpus": corpus, "results": results, "tree": tree}, f, indent=2)
+
+    if baseline is not None:
+        if baseline.get("corpus") != corpus:
+            print("warning: baseline was measured on a different corpus", file=sys.stderr)
+        regressions = compare(results, baseline["results"], args.tolerance, tree, baseline.get("tree"))
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import asyncio
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from yapep.tokenizer import iter_tokens
+from yapep.parser import Parser
+from yapep.aio import aparse
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+S+R+240101:1200+1'"
+    + "".join(f"UNH+{n}+ORDERS:D:96A:UN'BGM+220+PO{n}+9'NAD+BY+Müller::9'UNT+4+{n}'" for n in range(1, 51))
+    + "UNZ+50+1'"
+)
+
+
+async def collect(messages):
+    return [message async for message in messages]
+
+
+class TestAio(unittest.TestCase):
+    def setUp(self):
+        self.expected = list(Parser(iter_tokens([DATA])).iter_messages())
+
+    def test_stream_reader(self):
+        """Test parsing from an in-memory asyncio.StreamReader fed in small pieces."""
+        async def run():
+            reader = asyncio.StreamReader()
+            data = DATA.encode('latin-1')
+            for start in range(0, len(data), 37):
+                reader.feed_data(data[start:start + 37])
+            reader.feed_eof()
+            return await collect(aparse(reader, chunk_size=100))
+
+        self.assertEqual(asyncio.run(run()), self.expected)
+
+    def test_async_iterator_and_executor(self):
+        """Test an async iterator of one big chunk, parsed in an executor."""
+        async def chunks():
+            yield DATA.encode('utf-8')
+
+        async def run():
+            with ThreadPoolExecutor(1) as executor:
+                return await collect(aparse(chunks(), chunk_size=64, encoding='utf-8', executor=executor))
+
+        self.assertEqual(asyncio.run(run()), self.expected)
+
+    def test_backpressure(self):
+        """Test that input is only read as fast as messages are consumed, and the loop keeps running."""
+        reads = []
+        ticks = []
+
+        async def chunks():
+            data = DATA.encode('latin-1')
+            for start in range(0, len(data), 50):
+                reads.append(start)
+                yield data[start:start + 50]
+
+        async def ticker():
+            while True:
+                ticks.append(None)
+                await asyncio.sleep(0)
+
+        async def run():
+            task = asyncio.create_task(ticker())
+            messages = aparse(chunks())
+            first = await messages.__anext__()
+            read_before = len(reads)
+            rest = await collect(messages)
+            task.cancel()
+            return [first] + rest, read_before
+
+        messages, read_before = asyncio.run(run())
+        self.assertEqual(messages, self.expected)
+        self.assertLess(read_before, 6)
+        self.assertGreater(len(ticks), len(reads) // 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,20 @@
+import copy
+import pickle
+import tracemalloc
 import unittest
-from yapep.ast import Node, File, Interchange, Message, Segment, Element, Component, Visitor
+from yapep.ast import Node, File, Interchange, Message, Segment, Element, FlatElement, Component, Visitor, \
+    SKIP_CHILDREN, STOP
+from yapep.parser import Parser
+from yapep.tokenizer import Tokenizer, Token, TokenType
+
+
+# Reference file for the memory footprint test: one ORDERS message with
+# 2000 repetitions of a typical line item group.
+REFERENCE_EDI = (
+    "UNA:+.? 'UNB+UNOC:3+SENDER+RECEIVER+240101:1200+1'UNH+1+ORDERS:D:96A:UN'"
+    + "NAD+BY+5412345000013::9'LIN+1++4000862141404:SRS'QTY+21:48'MOA+77:123.45'DTM+137:20240101:102'" * 2000
+    + "UNT+10002+1'UNZ+1+1'"
+)
 
 
 class TestAst(unittest.TestCase):
@@ -136,6 +151,144 @@ class TestAst(unittest.TestCase):
         # Each element has at least one component
         self.assertGreaterEqual(visitor.component_count, 1)
 
+    def test_visitor_pruning(self):
+        """Test that traversal stops at the deepest level the visitor overrides."""
+        class MessageTypes(Visitor):
+            def __init__(self):
+                self.types = []
+
+            def visit_message(self, message):
+                self.types.append(message.header.elements[1].components[0].value)
+
+        class Components(Visitor):
+            def visit_component(self, component):
+                raise AssertionError("components must not be visited")
+
+        edi_file = Parser(Tokenizer(REFERENCE_EDI).tokenize_stream(), lazy=True).parse()
+        visitor = MessageTypes()
+        edi_file.accept(visitor)
+        self.assertEqual(visitor.types, ["ORDERS"])
+        message = edi_file.interchanges[0].messages[0]
+        self.assertTrue(all(segment._elements is None for segment in message.segments))
+
+        class Segments(Visitor):
+            def visit_segment(self, segment):
+                pass
+
+        edi_file.accept(Segments())
+        self.assertTrue(all(segment._elements is None for segment in message.segments))
+        self.assertIsNone(Components().visit_file(edi_file))
+
+    def test_visitor_signals(self):
+        """Test that SKIP_CHILDREN skips a subtree and STOP ends the traversal."""
+        class Collector(Visitor):
+            def __init__(self):
+                self.seen = []
+
+            def visit_segment(self, segment):
+                self.seen.append(segment.tag)
+                if segment.tag == "NAD":
+                    return SKIP_CHILDREN
+                if segment.tag == "MOA":
+                    return STOP
+
+            def visit_component(self, component):
+                self.seen.append(component.value)
+
+        edi_file = Parser(Tokenizer(REFERENCE_EDI).tokenize()).parse()
+        visitor = Collector()
+        self.assertIs(edi_file.accept(visitor), STOP)
+        self.assertEqual(visitor.seen, ["NAD", "LIN", "1", "", "4000862141404", "SRS", "QTY", "21", "48", "MOA"])
+
+        class FirstComponents(Visitor):
+            def __init__(self):
+                self.seen = []
+
+            def visit_element(self, element):
+                if len(element.components) > 1:
+                    return SKIP_CHILDREN
+
+            def visit_component(self, component):
+                self.seen.append(component.value)
+                if len(self.seen) == 4:
+                    return STOP
+
+        visitor = FirstComponents()
+        self.assertIs(edi_file.interchanges[0].accept(visitor), STOP)
+        self.assertEqual(visitor.seen, ["BY", "1", "", "BY"])
+
+    def test_slots(self):
+        """Test that AST nodes and tokens carry no per-instance __dict__."""
+        segment = Segment("SEG", [Element([Component("1")])])
+        for node in (Component("1"), segment.elements[0], segment, FlatElement(Component("1")),
+                     Token(TokenType.SEGMENT_TAG, "SEG")):
+            self.assertFalse(hasattr(node, '__dict__'), type(node).__name__)
+
+    def test_flat_element(self):
+        """Test that a flattened element exposes its single component like an Element."""
+        element = FlatElement(Component("BY"))
+        self.assertEqual(len(element.components), 1)
+        self.assertEqual(element.components[0].value, "BY")
+        self.assertIsInstance(element, Element)
+
+        segment = Parser(Tokenizer("NAD+BY+123::9'").tokenize(), flatten=True)._parse_segment()
+        self.assertIsInstance(segment.elements[0], FlatElement)
+        self.assertNotIsInstance(segment.elements[1], FlatElement)
+        self.assertEqual([c.value for c in segment.elements[1].components], ["123", "", "9"])
+        self.assertEqual(segment, Parser(Tokenizer("NAD+BY+123::9'").tokenize())._parse_segment())
+        self.assertEqual(Element([Component("BY")]), element)
+        self.assertNotEqual(element, Element([Component("SU")]))
+        with self.assertRaises(AttributeError):
+            element.components.append(Component("SU"))
+
+        flat = Parser(Tokenizer(REFERENCE_EDI).tokenize(), flatten=True).parse()
+        eager = Parser(Tokenizer(REFERENCE_EDI).tokenize()).parse()
+        for copied in (pickle.loads(pickle.dumps(flat)), copy.deepcopy(flat)):
+            self.assertEqual(copied, eager)
+            self.assertIsInstance(copied.interchanges[0].messages[0].segments[0].elements[0], FlatElement)
+        self.assertEqual(copy.copy(element), element)
+
+    def test_segment_index(self):
+        """Test tag and qualifier lookups on hand-built and parsed messages."""
+        nad_by = Segment("NAD", [Element([Component("BY")]), Element([Component("111")])])
+        nad_su = Segment("NAD", [Element([Component("SU")]), Element([Component("222")])])
+        moa = Segment("MOA", [Element([Component("77"), Component("1.00")])])
+        message = Message(Segment("UNH", []), Segment("UNT", []), [nad_su, moa, nad_by])
+
+        self.assertIs(message.find("NAD", qualifier="BY"), nad_by)
+        self.assertIs(message.find("NAD"), nad_su)
+        self.assertIsNone(message.find("NAD", qualifier="DP"))
+        self.assertIsNone(message.find("BGM"))
+        self.assertEqual(message.segments_by_tag("NAD"), [nad_su, nad_by])
+
+        message.segments.append(Segment("MOA", [Element([Component("79")])]))
+        message.reindex()
+        self.assertEqual(len(message.segments_by_tag("MOA")), 2)
+
+        edi_file = Parser(Tokenizer(REFERENCE_EDI).tokenize()).parse()
+        expected = [s for m in edi_file.interchanges[0].messages for s in m.segments if s.tag == "MOA"]
+        self.assertEqual(edi_file.segments_by_tag("MOA"), expected)
+        self.assertEqual(edi_file.find("NAD", qualifier="BY").elements[1].components[0].value, "5412345000013")
+        self.assertEqual(edi_file.segments_by_tag("MOA", qualifier="86"), [])
+        for tag in ("UNB", "UNH", "UNT", "UNZ"):  # envelopes are not indexed
+            self.assertEqual(edi_file.segments_by_tag(tag), [])
+            self.assertEqual(message.segments_by_tag(tag), [])
+
+    def test_memory_per_segment(self):
+        """Bound the parsed tree footprint per segment; benchmarks.run reports the measured values."""
+        budgets = {"eager": 600, "flatten": 550}
+        for mode, flatten in (("eager", False), ("flatten", True)):
+            tokens = Tokenizer(REFERENCE_EDI).tokenize()
+            tracemalloc.start()
+            try:
+                edi_file = Parser(tokens, flatten=flatten).parse()
+                allocated, _ = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            segments = sum(len(m.segments) for i in edi_file.interchanges for m in i.messages)
+            per_segment = allocated / segments
+            self.assertLess(per_segment, budgets[mode], f"{mode}: {per_segment:.0f} bytes/segment")
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+from yapep.tokenizer import Tokenizer, Delimiters
+from yapep.parser import Parser
+from yapep.cache import ParseCache
+from yapep.snapshot import _HEADER
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+S+R+240101:1200+1'"
+    "UNH+1+INVOIC:D:96A:UN'BGM+380+INV?'1'NAD+BY++X'UNT+4+1'UNZ+1+1'"
+)
+
+
+class TestParseCache(unittest.TestCase):
+    def test_memory(self):
+        """Test that a repeat is served from memory and equals a fresh parse."""
+        cache = ParseCache()
+        edi_file = cache.parse(DATA)
+        self.assertEqual(edi_file, Parser(Tokenizer(DATA).tokenize()).parse())
+        self.assertIs(cache.parse(DATA), edi_file)
+        self.assertIsNot(cache.parse(DATA.encode()), edi_file)
+        self.assertEqual(cache.parse(DATA.encode()), edi_file)
+        self.assertEqual((cache.hits, cache.disk_hits, cache.misses), (2, 0, 2))
+
+        # delimiters and encoding are part of the key
+        self.assertNotEqual(cache.key(DATA), cache.key(DATA, delimiters=Delimiters(terminator='~')))
+        self.assertNotEqual(cache.key(DATA.encode()), cache.key(DATA.encode(), 'utf-8'))
+
+    def test_eviction(self):
+        """Test that the least recently used entries go first."""
+        texts = [DATA.replace("INV", f"IN{i}") for i in range(3)]
+        cache = ParseCache(max_bytes=len(DATA) * 40 * 2)
+        first = cache.parse(texts[0])
+        cache.parse(texts[1])
+        cache.parse(texts[0])
+        cache.parse(texts[2])
+        self.assertEqual(len(cache), 2)
+        self.assertIn(cache.key(texts[0]), cache)
+        self.assertNotIn(cache.key(texts[1]), cache)
+        self.assertIs(cache.parse(texts[0]), first)
+        self.assertEqual(cache.size, len(DATA) * 40 * 2)
+
+        cache = ParseCache(max_bytes=10)
+        cache.parse(DATA)
+        self.assertEqual(len(cache), 0)
+
+    def test_disk(self):
+        """Test that entries written by one cache are read by another."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'in.edi')
+            with open(path, 'w') as f:
+                f.write(DATA)
+            expected = ParseCache(directory=directory).parse_path(path)
+
+            cache = ParseCache(directory=directory)
+            edi_file = cache.parse_path(path)
+            self.assertEqual(edi_file, expected)
+            self.assertEqual(edi_file.find("NAD").elements[2].components[0].value, "X")
+            self.assertEqual((cache.disk_hits, cache.misses), (1, 0))
+
+            entry = cache._path(cache.key(DATA.encode()))
+            with open(entry, 'rb') as f:
+                snapshot = f.read()
+            # a foreign file, and a well-formed one with indexes out of range
+            damaged = snapshot[:_HEADER.size] + b'\xff' * (len(snapshot) - _HEADER.size)
+            for misses, content in enumerate((b'garbage', damaged), 1):
+                with open(entry, 'wb') as f:
+                    f.write(content)
+                cache.clear()
+                self.assertEqual(cache.parse_path(path), expected)
+                self.assertEqual(cache.misses, misses)
+            cache.clear(disk=True)
+            self.assertFalse(os.path.exists(entry))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from yapep.cli import main
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+S+R+240101:1200+{n}'"
+    "UNH+1+ORDERS:D:96A:UN'BGM+220+PO{n}+9'UNT+3+1'UNH+2+ORDERS:D:96A:UN'BGM+220+PO{n}B+9'UNT+3+2'"
+    "UNZ+2+{n}'"
+)
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        os.makedirs(os.path.join(self.tmp.name, 'in', 'nested'))
+        for n, name in enumerate(('a.edi', 'b.edi', os.path.join('nested', 'c.edi'))):
+            with open(os.path.join(self.tmp.name, 'in', name), 'w') as f:
+                f.write(DATA.format(n=n))
+        with open(os.path.join(self.tmp.name, 'in', 'notes.txt'), 'w') as f:
+            f.write("not edi")
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        err = io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            code = main(list(argv))
+        return code, out.getvalue(), err.getvalue()
+
+    def test_summary(self):
+        """Test per-file and total lines for a directory."""
+        folder = os.path.join(self.tmp.name, 'in')
+        code, out, err = self.run_cli(folder, '--pattern', '*.edi', '--workers', '1')
+        self.assertEqual(code, 0, err)
+        lines = out.splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[0].startswith(os.path.join(folder, 'a.edi') + ": "))
+        self.assertIn("1 interchanges, 2 messages, 9 segments", lines[0])
+        self.assertIn("3 interchanges, 6 messages, 27 segments", lines[-1])
+        self.assertIn("3 files", lines[-1])
+        self.assertIn("segments/s", lines[-1])
+
+    def test_ndjson_and_failures(self):
+        """Test NDJSON output from a glob in a process pool, with a failing and a missing input."""
+        with open(os.path.join(self.tmp.name, 'in', 'bad.edi'), 'w') as f:
+            f.write("UNA:+")
+        output = os.path.join(self.tmp.name, 'out.ndjson')
+        code, out, err = self.run_cli(os.path.join(self.tmp.name, 'in', '*.edi'), os.path.join(self.tmp.name, 'nope'),
+                                      '-f', 'ndjson', '-o', output, '-w', '2', '-q')
+        self.assertEqual(code, 1)
+        self.assertEqual(out, '')
+        self.assertIn("FAILED " + os.path.join(self.tmp.name, 'in', 'bad.edi'), err)
+        self.assertIn("no such file or pattern", err)
+        self.assertIn("2 files", err)
+        self.assertIn("2 failed", err)
+        with open(output) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([line["segments"][0] for line in lines],
+                         [["BGM", ["220"], ["PO0"], ["9"]], ["BGM", ["220"], ["PO0B"], ["9"]],
+                          ["BGM", ["220"], ["PO1"], ["9"]], ["BGM", ["220"], ["PO1B"], ["9"]]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from array import array
+from yapep.tokenizer import Tokenizer, iter_tokens
+from yapep.parser import Parser
+from yapep.columnar import segment_table, numpy
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+S+R+240101:1200+1'"
+    "UNH+1+INVOIC:D:96A:UN'BGM+380+INV1'MOA+77:100.50'MOA+79:90'UNT+5+1'"
+    "UNH+2+INVOIC:D:96A:UN'MOA+77:20'NAD+BY++X'UNT+4+2'UNZ+2+1'"
+    "UNB+UNOC:3+S+R+240101:1200+2'UNH+3+INVOIC:D:96A:UN'MOA+77:3.25'UNT+3+3'UNZ+1+2'"
+)
+
+ROWS = [
+    (0, 0, 0, "BGM", 0, 0, "380"), (0, 0, 0, "BGM", 1, 0, "INV1"),
+    (0, 0, 1, "MOA", 0, 0, "77"), (0, 0, 1, "MOA", 0, 1, "100.50"),
+    (0, 0, 2, "MOA", 0, 0, "79"), (0, 0, 2, "MOA", 0, 1, "90"),
+    (0, 1, 0, "MOA", 0, 0, "77"), (0, 1, 0, "MOA", 0, 1, "20"),
+    (0, 1, 1, "NAD", 0, 0, "BY"), (0, 1, 1, "NAD", 1, 0, ""), (0, 1, 1, "NAD", 2, 0, "X"),
+    (1, 0, 0, "MOA", 0, 0, "77"), (1, 0, 0, "MOA", 0, 1, "3.25"),
+]
+
+
+def rows(table):
+    return list(zip(table.interchange, table.message, table.segment, table.tag,
+                    table.element, table.component, table.value))
+
+
+class TestColumnar(unittest.TestCase):
+    def test_table(self):
+        """Test the rows built from a parsed file."""
+        table = segment_table(Parser(Tokenizer(DATA).tokenize()).parse(), use_numpy=False)
+        self.assertIsInstance(table.segment, array)
+        self.assertEqual(len(table), len(ROWS))
+        self.assertEqual(rows(table), ROWS)
+        moa = [i for i, tag in enumerate(table.tag) if tag == "MOA"]
+        self.assertTrue(all(table.tag[i] is table.tag[moa[0]] for i in moa))
+        self.assertIs(table.value[2], table.value[6])
+
+    def test_sources(self):
+        """Test that streamed and partial sources give the same rows."""
+        self.assertEqual(rows(segment_table(Parser(iter_tokens([DATA])), use_numpy=False)), ROWS)
+        interchanges = Parser(iter_tokens([DATA])).iter_interchanges()
+        self.assertEqual(rows(segment_table(interchanges, use_numpy=False)), ROWS)
+        edi_file = Parser(Tokenizer(DATA).tokenize_stream(), lazy=True).parse()
+        self.assertEqual(rows(segment_table(edi_file.interchanges[0], use_numpy=False)), ROWS[:11])
+        messages = edi_file.interchanges[0].messages
+        self.assertEqual(rows(segment_table(messages[1], use_numpy=False)), [(0, 0) + row[2:] for row in ROWS[6:11]])
+        self.assertEqual(len(segment_table([], use_numpy=False)), 0)
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_numpy(self):
+        """Test vectorized filtering on NumPy columns."""
+        table = segment_table(Parser(Tokenizer(DATA).tokenize()).parse())
+        self.assertIsInstance(table.value, numpy.ndarray)
+        qualifier = (table.tag == "MOA") & (table.element == 0) & (table.component == 0) & (table.value == "77")
+        amounts = table.value[numpy.nonzero(qualifier)[0] + 1]
+        self.assertEqual(list(amounts), ["100.50", "20", "3.25"])
+
+
+if __name__ == '__main__':
+    unittest.main()
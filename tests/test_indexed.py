@@ -0,0 +1,89 @@
+import gc
+import os
+import tempfile
+import unittest
+import warnings
+from yapep.tokenizer import Tokenizer
+from yapep.parser import Parser
+from yapep.indexed import open_indexed, build_index, index_path
+
+
+DATA = (
+    "UNA*+.? 'UNB+UNOW*3+S+R+240101*1200+A1'"
+    "UNH+1+INVOIC*D*96A*UN'BGM+380+INV?'1'NAD+BY++Müller'UNT+4+1'"
+    "UNH+2+DESADV*D*96A*UN'BGM+351'UNT+3+2'UNZ+2+A1'\n"
+    "UNB+UNOW*3+Säger+R+240101*1200+Ä2'UNH+1+ORDERS*D*96A*UN'BGM+220'UNT+3+1'UNZ+1+Ä2'\n"
+)
+
+
+class TestIndexed(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'archive.edi')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(DATA)
+        full = Parser(Tokenizer(DATA.encode('utf-8')).tokenize_stream()).parse()
+        self.interchanges = full.interchanges
+        self.messages = [message for interchange in full.interchanges for message in interchange.messages]
+
+    def test_random_access(self):
+        """Test that indexed messages equal the fully parsed ones."""
+        indexed = open_indexed(self.path)
+        self.assertTrue(os.path.exists(index_path(self.path)))
+        self.assertEqual(len(indexed), 3)
+        for number in (2, 0, 1, -1):
+            self.assertEqual(indexed.message(number), self.messages[number])
+        self.assertEqual(indexed.message(0).find("NAD").elements[2].components[0].value, "Müller")
+        self.assertEqual(indexed.delimiters.component, "*")
+        with self.assertRaises(IndexError):
+            indexed.message(3)
+
+        entry = indexed.entry(1)
+        self.assertEqual((entry.reference, entry.type, entry.interchange, entry.interchange_reference),
+                         ("2", "DESADV", 0, "A1"))
+        self.assertEqual(DATA.encode('utf-8')[entry.offset:entry.offset + entry.length],
+                         b"UNH+2+DESADV*D*96A*UN'BGM+351'UNT+3+2'")
+        self.assertEqual(indexed.interchange_header(1), self.interchanges[1].header)
+        self.assertEqual(indexed.interchange_header(1).elements[1].components[0].value, "Säger")
+
+        self.assertEqual(indexed.entry(-1), indexed.entry(2))
+        self.assertEqual(indexed.entry(-1).interchange_reference, "Ä2")
+        with self.assertRaises(IndexError):
+            indexed.entry(-4)
+
+        with warnings.catch_warnings(record=True) as caught:  # no handle is left open
+            warnings.simplefilter('always')
+            open_indexed(self.path).message(0)
+            gc.collect()
+        self.assertFalse([w for w in caught if issubclass(w.category, ResourceWarning)])
+
+    def test_by_reference(self):
+        """Test lookups by UNH reference, optionally within an interchange."""
+        indexed = open_indexed(self.path)
+        self.assertEqual(indexed.by_reference("1"), self.messages[0])
+        self.assertEqual(indexed.by_reference("1", "Ä2"), self.messages[2])
+        self.assertEqual(indexed.numbers("1", "Ä2"), [2])
+        self.assertEqual(indexed.numbers("1"), [0, 2])
+        with self.assertRaises(KeyError):
+            indexed.by_reference("9")
+
+    def test_stale(self):
+        """Test that a changed file is reindexed, or rejected without rebuild."""
+        build_index(self.path)
+        open_indexed(self.path, rebuild=False)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write("UNB+UNOW*3+S+R+240101*1200+A3'UNH+1+APERAK'UNT+2+1'UNZ+1+A3'")
+        with self.assertRaises(ValueError):
+            open_indexed(self.path, rebuild=False)
+        indexed = open_indexed(self.path)
+        self.assertEqual(len(indexed), 4)
+        self.assertEqual(indexed.entry(3).type, "APERAK")
+        sidecar = os.path.join(os.path.dirname(self.path), 'other.idx')
+        indexed = open_indexed(self.path, sidecar)
+        self.assertTrue(os.path.exists(sidecar))
+        self.assertEqual(len(indexed), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
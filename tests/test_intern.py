@@ -0,0 +1,61 @@
+import unittest
+from yapep.tokenizer import Tokenizer, iter_tokens
+from yapep.parser import Parser
+from yapep.intern import InternPool
+
+
+DATA = (
+    "UNB+UNOC:3+S+R+240101:1200+1'"
+    "UNH+1+INVOIC:D:96A:UN'NAD+BY+4000000000001::9'NAD+SU+4000000000002::9'UNT+4+1'"
+    "UNH+2+INVOIC:D:96A:UN'NAD+BY+4000000000003::9'UNT+3+2'UNZ+2+1'"
+)
+
+
+class TestInternPool(unittest.TestCase):
+    def test_parser(self):
+        """Test that equal values share one Component and tags one str."""
+        pool = InternPool(share_components=True)
+        edi_file = Parser(Tokenizer(DATA.encode()).tokenize_stream(), pool=pool).parse()
+        first, second = edi_file.interchanges[0].messages
+        by, su = first.segments
+        self.assertIs(by.tag, second.segments[0].tag)
+        self.assertIs(by.elements[1].components[2], su.elements[1].components[2])
+        self.assertIs(by.elements[0].components[0], second.segments[0].elements[0].components[0])
+        self.assertIsNot(by.elements[1].components[0], su.elements[1].components[0])
+        self.assertEqual(edi_file, Parser(Tokenizer(DATA).tokenize()).parse())
+        self.assertGreater(pool.hit_rate, 0.3)
+
+    def test_tokenizer(self):
+        """Test interning of Token values, alone and with the parser pool."""
+        pool = InternPool()
+        tokens = Tokenizer(DATA, pool=pool).tokenize()
+        nines = [token.value for token in tokens if token.value == "9"]
+        self.assertEqual(len(nines), 3)
+        self.assertTrue(all(value is nines[0] for value in nines))
+        streamed = [token.value for token in iter_tokens([DATA], pool=pool) if token.value == "9"]
+        self.assertTrue(all(value is nines[0] for value in streamed))
+
+        messages = list(Parser(tokens, pool=pool).iter_messages())
+        self.assertIs(messages[0].segments[0].elements[1].components[2].value, nines[0])
+
+    def test_bounds(self):
+        """Test that the pool stops admitting values when full or too long."""
+        pool = InternPool(max_size=2, max_length=4, share_components=True)
+        values = ["A", "B", "C", "C", "LONGER"]
+        components = [pool.component(value) for value in values]
+        self.assertIsNot(components[2], components[3])
+        self.assertEqual(components[2], components[3])
+        self.assertIs(pool.component("A"), components[0])
+        self.assertEqual(pool.as_dict(), {"strings": 0, "components": 2, "lookups": 5, "misses": 4,
+                                          "skipped": 1, "hit_rate": 0.2})
+        pool.clear()
+        self.assertEqual(len(pool), 0)
+
+        pool = InternPool()
+        a, b = pool.component("BY"), pool.component("BY")
+        self.assertIsNot(a, b)
+        self.assertIs(a.value, b.value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+from yapep.tokenizer import Tokenizer
+from yapep.parser import Parser
+from yapep.ast import Visitor
+from yapep.lazy import LazySegment, LazyElement
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOA:1+S+R+1'UNH+1+INVOIC:D:96A:UN'BGM+380+INV?+1+9'"
+    "NAD+BY+5412345000013::9'NAD+SU+4012345500004::9'MOA+77:1234.50'"
+    "UNT+6+1'UNZ+1+1'"
+)
+
+
+def as_values(segment):
+    return segment.tag, [[component.value for component in element.components] for element in segment.elements]
+
+
+class TestLazy(unittest.TestCase):
+    def test_decode_on_access(self):
+        """Test that elements and components are only decoded when read."""
+        edi_file = Parser(Tokenizer(DATA).tokenize_stream(), lazy=True).parse()
+        message = edi_file.interchanges[0].messages[0]
+        nad = message.segments[1]
+
+        self.assertIsInstance(nad, LazySegment)
+        self.assertEqual(nad.tag, "NAD")
+        self.assertIsNone(nad._elements)
+
+        element = nad.elements[1]
+        self.assertIsInstance(element, LazyElement)
+        self.assertIsNone(element._components)
+        self.assertEqual([c.value for c in element.components], ["5412345000013", "", "9"])
+        self.assertIs(nad.elements, nad.elements)
+        self.assertIsNone(message.segments[2]._elements)
+
+    def test_same_values_as_eager(self):
+        """Test that lazy segments expose the same values as eagerly parsed ones."""
+        eager = Parser(Tokenizer(DATA).tokenize()).parse()
+        lazy = Parser(Tokenizer(DATA).tokenize_stream(), lazy=True).parse()
+
+        for eager_ichg, lazy_ichg in zip(eager.interchanges, lazy.interchanges):
+            self.assertEqual(as_values(lazy_ichg.header), as_values(eager_ichg.header))
+            self.assertEqual(as_values(lazy_ichg.trailer), as_values(eager_ichg.trailer))
+            for eager_msg, lazy_msg in zip(eager_ichg.messages, lazy_ichg.messages):
+                self.assertEqual(
+                    [as_values(s) for s in lazy_msg.segments],
+                    [as_values(s) for s in eager_msg.segments],
+                )
+
+    def test_equal_to_eager(self):
+        """Test that a lazy tree compares equal to the eager tree, both ways."""
+        eager = Parser(Tokenizer(DATA).tokenize()).parse()
+        lazy = Parser(Tokenizer(DATA).tokenize_stream(), lazy=True).parse()
+        nad = lazy.interchanges[0].messages[0].segments[1]
+        self.assertEqual(nad.elements[1], eager.interchanges[0].messages[0].segments[1].elements[1])
+        self.assertNotEqual(nad, eager.interchanges[0].messages[0].segments[2])
+        self.assertEqual(lazy, eager)
+        self.assertEqual(eager, lazy)
+
+    def test_accept(self):
+        """Test that visitors see the same nodes on lazy trees."""
+        class CountingVisitor(Visitor):
+            def __init__(self):
+                self.counts = {}
+
+            def _count(self, kind):
+                self.counts[kind] = self.counts.get(kind, 0) + 1
+
+            def visit_segment(self, segment):
+                self._count(segment.tag)
+
+            def visit_element(self, element):
+                self._count("element")
+
+            def visit_component(self, component):
+                self._count("component")
+
+        eager, lazy = CountingVisitor(), CountingVisitor()
+        Parser(Tokenizer(DATA).tokenize()).parse().accept(eager)
+        Parser(Tokenizer(DATA).tokenize_stream(), lazy=True).parse().accept(lazy)
+        self.assertEqual(lazy.counts, eager.counts)
+
+    def test_assign_elements(self):
+        """Test that decoded attributes can still be replaced."""
+        segment = Parser(Tokenizer("SEG+1+2'").tokenize_stream(), lazy=True)._parse_segment()
+        segment.elements = []
+        self.assertEqual(segment.elements, [])
+
+    def test_lazy_needs_token_stream(self):
+        """Test that lazy parsing rejects plain token lists."""
+        with self.assertRaises(TypeError):
+            Parser(Tokenizer(DATA).tokenize(), lazy=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import io
+import json
+import random
+import unittest
+from yapep.tokenizer import Tokenizer, iter_tokens
+from yapep.parser import Parser
+from yapep.ndjson import export_ndjson, iter_ndjson
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+SENDER+RECEIVER+240101:1200+REF1'"
+    "UNH+1+ORDERS:D:96A:UN'BGM+220+PO1+9'FTX+AAI+++O?'Brien \"Q\"'NAD+BY+5412345000013::9'NAD+SU++'UNT+6+1'"
+    "UNZ+1+REF1'"
+    "UNH+9+STRAY'UNT+2+9'"
+    "UNB+UNOC:3+S+R+240101:1200'UNH+2+INVOIC:D:96A:UN'BGM+380+Köln'UNT+3+2'UNZ+1'"
+)
+
+
+def expected_lines(data):
+    # the same JSON built from the parsed messages
+    def segment(s):
+        return [s.tag] + [[c.value for c in e.components] for e in s.elements]
+
+    parser = Parser(iter_tokens([data]))
+    lines = []
+    for message in parser.iter_messages():
+        unb = parser.interchange_header
+        reference = None
+        if unb is not None and len(unb.elements) > 4:
+            reference = unb.elements[4].components[0].value
+        lines.append({
+            "interchange": reference,
+            "header": segment(message.header),
+            "segments": [segment(s) for s in message.segments],
+            "trailer": segment(message.trailer),
+        })
+    return lines
+
+
+class TestNdjson(unittest.TestCase):
+    def test_matches_parser(self):
+        """Test that each line holds the same data as the parsed message."""
+        lines = list(iter_ndjson(Tokenizer(DATA).tokenize_stream()))
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(line.endswith('}\n') and '\n' not in line[:-1] for line in lines))
+        self.assertEqual([json.loads(line) for line in lines], expected_lines(DATA))
+        self.assertEqual(json.loads(lines[0])["segments"][1], ["FTX", ["AAI"], [""], [""], ["O'Brien\"Q\""]])
+        self.assertIsNone(json.loads(lines[2])["interchange"])
+
+    def test_sources(self):
+        """Test that token streams over text and bytes and token iterators give the same output."""
+        data = DATA + DATA[9:].replace("PO1", "a??b?'c")
+        expected = list(iter_ndjson(Tokenizer(data).tokenize_stream()))
+        self.assertEqual([json.loads(line) for line in expected], expected_lines(data))
+        self.assertEqual(list(iter_ndjson(Tokenizer.from_buffer(data.encode('latin-1')).tokenize_stream())), expected)
+        self.assertEqual(list(iter_ndjson(iter_tokens([data], chunk_size=7))), expected)
+
+    def test_truncated(self):
+        """Test that unterminated input is handled like the parser handles it."""
+        rng = random.Random(5)
+        for _ in range(30):
+            data = DATA[:rng.randrange(9, len(DATA))]
+            lines = [json.loads(line) for line in iter_ndjson(iter_tokens([data]))]
+            self.assertEqual(lines, expected_lines(data), data)
+
+    def test_export(self):
+        """Test writing to text and binary sinks in buffered writes."""
+        text = io.StringIO()
+        self.assertEqual(export_ndjson(Tokenizer(DATA).tokenize_stream(), text, buffer_size=10), 3)
+        binary = io.BytesIO()
+        export_ndjson(Tokenizer(DATA).tokenize(), binary, ensure_ascii=True)
+        self.assertEqual(binary.getvalue().decode('ascii'), text.getvalue().replace("ö", "\\u00f6"))
+
+
+if __name__ == '__main__':
+    unittest.main()
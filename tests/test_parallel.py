@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from yapep.parallel import parse_parallel, iter_parallel
+from yapep.parser import Parser
+from yapep.tokenizer import Tokenizer
+
+
+def build_file(interchanges: int, messages: int) -> str:
+    parts = ["UNA:+.? '\n"]
+    for i in range(interchanges):
+        parts.append(f"UNB+UNOC:3+SENDER+RECEIVER+240101:1200+{i}'\n")
+        for m in range(messages):
+            parts.append(
+                f"UNH+{m}+INVOIC:D:96A:UN'\nBGM+380+INV{i}-{m}+9'\n"
+                f"NAD+BY+5412345000013::9++Müller?+Söhne'\nFTX+AAA+++a?'b'\nMOA+77:{m}.50'\n"
+                f"UNT+6+{m}'\n"
+            )
+        parts.append(f"UNZ+{messages}+{i}'\n")
+    return ''.join(parts)
+
+
+class TestParallel(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.text = build_file(3, 40)
+        self.path = os.path.join(self.tmp.name, 'invoices.edi')
+        with open(self.path, 'wb') as f:
+            f.write(self.text.encode('latin-1'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_parse_parallel(self):
+        """Test that parallel parsing builds the same file as the sequential parser."""
+        expected = Parser(Tokenizer(self.text).tokenize()).parse()
+        for workers in (1, 2):
+            self.assertEqual(parse_parallel(self.path, workers=workers, batch_size=300), expected)
+
+    def test_iter_parallel(self):
+        """Test that messages are yielded in their original order."""
+        expected = [
+            message
+            for interchange in Parser(Tokenizer(self.text).tokenize()).parse().interchanges
+            for message in interchange.messages
+        ]
+        self.assertEqual(list(iter_parallel(self.path, workers=2, batch_size=500)), expected)
+
+    def test_custom_delimiters(self):
+        """Test that UNA delimiters reach the workers."""
+        text = self.text.replace("UNA:+.? '", "UNA*#.! ~").replace("'", "~").replace("+", "#") \
+            .replace(":", "*").replace("?", "!")
+        with open(self.path, 'wb') as f:
+            f.write(text.encode('latin-1'))
+        expected = Parser(Tokenizer(text).tokenize()).parse()
+        self.assertEqual(parse_parallel(self.path, workers=2, batch_size=1000), expected)
+
+    def test_header_charset(self):
+        """Test that a UNOW header is decoded as UTF-8."""
+        text = "UNB+UNOW:3+Müller+R+240101:1200+1'UNH+1+INVOIC'FTX+Grüße'UNT+3+1'UNZ+1+1'"
+        with open(self.path, 'wb') as f:
+            f.write(text.encode('utf-8'))
+        edi_file = parse_parallel(self.path, workers=1)
+        self.assertEqual(edi_file, Parser(Tokenizer(text).tokenize()).parse())
+        self.assertEqual(edi_file.interchanges[0].header.elements[1].components[0].value, "Müller")
+
+
+if __name__ == '__main__':
+    unittest.main()
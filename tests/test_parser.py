@@ -1,5 +1,5 @@
 import unittest
-from yapep.tokenizer import Tokenizer, Token, TokenType
+from yapep.tokenizer import Tokenizer, Token, TokenType, iter_tokens
 from yapep.parser import Parser
 from yapep.ast import File, Interchange, Message, Segment, Element, Component
 
@@ -213,6 +213,135 @@ class TestParser(unittest.TestCase):
         self.assertEqual(len(message.segments), 1)
         self.assertEqual(message.segments[0].tag, "SEG")
 
+    def test_parse_file_without_una(self):
+        """Test that the first interchange is kept when there is no UNA header."""
+        data = "UNB+UNOA:1+S+R'UNH+1+ORDERS'SEG+data'UNT+3+1'UNZ+1+1'"
+        edi_file = Parser(Tokenizer(data).tokenize()).parse()
+
+        self.assertIsNone(edi_file.una)
+        self.assertEqual(len(edi_file.interchanges), 1)
+        self.assertEqual(edi_file.interchanges[0].messages[0].segments[0].tag, "SEG")
+
+    def test_iter_messages(self):
+        """Test streaming messages from a token iterator."""
+        data = (
+            "UNA:+.? '"
+            "UNB+UNOA:1+S+R+1'UNH+1+ORDERS'BGM+220+A'UNT+3+1'UNH+2+INVOIC'BGM+380+B'UNT+3+2'UNZ+2+1'"
+            "UNB+UNOA:1+S+R+2'UNH+3+DESADV'BGM+351+C'UNT+3+3'UNZ+1+2'"
+        )
+        parser = Parser(iter_tokens([data]))
+        seen = []
+        for message in parser.iter_messages():
+            seen.append((
+                parser.interchange_header.elements[3].components[0].value,
+                message.header.elements[1].components[0].value,
+                message.segments[0].elements[1].components[0].value,
+            ))
+
+        self.assertEqual(seen, [("1", "ORDERS", "A"), ("1", "INVOIC", "B"), ("2", "DESADV", "C")])
+        self.assertEqual(parser.una.tag, "UNA")
+
+    def test_iter_interchanges(self):
+        """Test that streamed interchanges match the ones built by parse()."""
+        data = (
+            "UNA:+.? 'UNB+UNOA:1+S+R+1'UNH+1+ORDERS'BGM+220+A'UNT+3+1'UNZ+1+1'"
+            "UNB+UNOA:1+S+R+2'UNH+2+ORDERS'BGM+220+B'DTM+137:20240101:102'UNT+4+2'UNZ+1+2'"
+        )
+        expected = Parser(Tokenizer(data).tokenize()).parse().interchanges
+        streamed = list(Parser(iter(Tokenizer(data).tokenize())).iter_interchanges())
+        self.assertEqual(streamed, expected)
+
+    def test_parse_token_stream(self):
+        """Test that parsing a TokenStream builds the same tree as parsing a token list."""
+        data = (
+            "UNA:+.? 'UNB+UNOA:1+S+R+1'UNH+1+ORDERS'BGM+220+A?+B'NAD+BY+5412345000013::9'"
+            "UNT+4+1'UNZ+1+1'"
+        )
+        expected = Parser(Tokenizer(data).tokenize()).parse()
+        self.assertEqual(Parser(Tokenizer(data).tokenize_stream()).parse(), expected)
+
+    def test_message_index(self):
+        """Test that messages come out of every parsing path already indexed by tag."""
+        data = "UNB+UNOA:1+S+R+1'UNH+1+ORDERS'BGM+220+A'NAD+SU+1'NAD+BY+2'UNT+5+1'UNZ+1+1'"
+        messages = [
+            Parser(Tokenizer(data).tokenize()).parse().interchanges[0].messages[0],
+            Parser(Tokenizer(data).tokenize_stream()).parse().interchanges[0].messages[0],
+            next(Parser(iter_tokens([data])).iter_messages()),
+        ]
+        for message in messages:
+            self.assertEqual(message._index, {"BGM": [0], "NAD": [1, 2]})
+            self.assertEqual(message.find("NAD", qualifier="BY").elements[1].components[0].value, "2")
+
+    def test_feed(self):
+        """Test that pushing tokens in arbitrary batches yields the same messages as iter_messages."""
+        data = (
+            "UNA:+.? 'UNB+UNOA:1+S+R+1'UNH+1+ORDERS'BGM+220+A'UNT+3+1'UNH+2+INVOIC'BGM+380+B'UNT+3+2'UNZ+2+1'"
+            "UNB+UNOA:1+S+R+2'UNH+3+DESADV'BGM+351+C'UNT+3+3'UNZ+1+2'UNH+4+X'UNT+2+4"
+        )
+        expected = list(Parser(iter_tokens([data])).iter_messages())
+        tokens = Tokenizer(data).tokenize()
+        for size in (1, 4, 7, len(tokens)):
+            parser = Parser([])
+            messages = []
+            for start in range(0, len(tokens), size):
+                messages += parser.feed(tokens[start:start + size])
+            self.assertIsNone(parser.interchange_header)
+            messages += parser.close()
+            self.assertEqual(messages, expected)
+            self.assertEqual(parser.una.tag, "UNA")
+
+    def test_parse_bytes(self):
+        """Test parsing a token stream over raw bytes."""
+        text = "UNA:+.? 'UNB+UNOC:3+S+R+1'UNH+1+ORDERS'NAD+BY++Müller'UNT+3+1'UNZ+1+1'"
+        expected = Parser(Tokenizer(text).tokenize()).parse()
+        stream = Tokenizer.from_buffer(text.encode('latin-1')).tokenize_stream()
+        self.assertEqual(Parser(stream).parse(), expected)
+
+    def test_recover(self):
+        """Test that recover skips malformed ranges and reports each one."""
+        data = (
+            "UNA:+.? 'UNB+UNOC:3+S+R+1'UNH+1+X'BGM+1'UNT+3+1'JUNK+1'MORE'UNH+2+X'BGM+2'"
+            "UNH+3+X'FTX+A''UNT+3+3'UNZ+3+1'UNB+UNOC:3+S+R+2'UNH+4+X'BGM+4"
+        )
+        for tokens in (Tokenizer(data).tokenize(), Tokenizer(data.encode()).tokenize_stream()):
+            parser = Parser(tokens, recover=True)
+            edi_file = parser.parse()
+            first, second = edi_file.interchanges
+            self.assertEqual([m.header.elements[0].components[0].value for m in first.messages], ["1", "2", "3"])
+            self.assertIsNone(first.messages[1].trailer)
+            self.assertEqual(first.messages[2].segments[0].tag, "FTX")
+            self.assertEqual(first.trailer.tag, "UNZ")
+            self.assertIsNone(second.trailer)
+            self.assertIsNone(second.messages[0].trailer)
+            self.assertEqual(second.messages[0].segments[0].tag, "BGM")
+            self.assertEqual([d.reason for d in parser.diagnostics], [
+                "expected UNH or UNZ", "missing UNT", "expected a segment tag", "missing UNT", "missing UNZ",
+            ])
+            skipped = parser.diagnostics[0]
+            self.assertEqual(tokens[skipped.start].value, "JUNK")
+            self.assertEqual(tokens[skipped.end].value, "UNH")
+            if parser._stream is not None:
+                self.assertEqual(data[skipped.offset:skipped.offset + 4], "JUNK")
+            else:
+                self.assertIsNone(skipped.offset)
+
+        escaped = "UNB+UNOC:3+S+R+1'UNH+1+X'BGM+1'UNT+3+1'JU?+NK+1'UNH+2+X'BGM+2'UNT+3+2'UNZ+2+1'"
+        for stream in (Tokenizer(escaped).tokenize_stream(), Tokenizer(escaped.encode()).tokenize_stream()):
+            parser = Parser(stream, recover=True)
+            self.assertEqual(len(parser.parse().interchanges[0].messages), 2)
+            self.assertEqual(len(parser.diagnostics), 1)
+            skipped = parser.diagnostics[0]
+            self.assertEqual(escaped[skipped.offset:skipped.offset + 8], "JU?+NK+1")
+
+        clean = "UNB+UNOA:1+S+R+1'UNH+1+X'BGM+1'UNT+3+1'UNZ+1+1'"
+        parser = Parser(Tokenizer(clean).tokenize(), recover=True)
+        self.assertEqual(parser.parse(), Parser(Tokenizer(clean).tokenize()).parse())
+        self.assertEqual(parser.diagnostics, [])
+
+        parser = Parser(Tokenizer("BGM+0'UNH+1+X'BGM+1'UNT+3+1'UNH+2+X").tokenize(), recover=True)
+        self.assertEqual([len(m.segments) for m in parser.parse_messages()], [1, 0])
+        self.assertEqual([d.reason for d in parser.diagnostics], ["expected UNH", "missing UNT"])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,64 @@
+import random
+import unittest
+from yapep.tokenizer import Tokenizer
+from yapep.parser import Parser
+from yapep.path import compile_path, extract, extract_first
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOA:1+SENDER+RECEIVER+1'"
+    "UNH+1+ORDERS:D:96A:UN'BGM+220+PO1+9'DTM+137:20240101:102'DTM+2:20240115:102'"
+    "NAD+BY+5412345000013::9'NAD+SU+4012345500004::9'UNT+6+1'"
+    "UNH+2+ORDERS:D:96A:UN'BGM+220+PO2+9'NAD+BY++BuyerTwo'UNT+4+2'"
+    "UNZ+2+1'"
+)
+
+
+class TestPath(unittest.TestCase):
+    def test_compile(self):
+        """Test parsing of path expressions and the expression cache."""
+        path = compile_path("NAD[BY]/1/2")
+        self.assertEqual((path.tag, path.qualifier, path.element, path.component), ("NAD", "BY", 1, 2))
+        self.assertEqual(compile_path("BGM/1").component, 0)
+        self.assertIs(compile_path("NAD[BY]/1/2"), path)
+        for invalid in ("NAD", "NAD[BY", "NAD/x", "NAD/1/2/3", ""):
+            with self.assertRaises(ValueError, msg=invalid):
+                compile_path(invalid)
+
+    def test_extract(self):
+        """Test extracting values from files, messages and segments."""
+        edi_file = Parser(Tokenizer(DATA).tokenize()).parse()
+        first = edi_file.interchanges[0].messages[0]
+
+        self.assertEqual(extract(edi_file, "NAD[BY]/1/0"), ["5412345000013", ""])
+        self.assertEqual(extract(edi_file, "NAD[BY]/2"), ["BuyerTwo"])
+        self.assertEqual(extract(edi_file, "BGM/1"), ["PO1", "PO2"])
+        self.assertEqual(extract_first(first, "DTM[2]/0/1"), "20240115")
+        self.assertEqual(extract_first(first, "UNH/1/0"), "ORDERS")
+        self.assertEqual(extract(edi_file, "UNB/1"), ["SENDER"])
+        self.assertEqual(extract(edi_file.interchanges[0], "UNT/1"), ["1", "2"])
+        self.assertIsNone(extract_first(first, "NAD[DP]/1/0"))
+        self.assertIsNone(extract_first(first, "NAD[BY]/1/7"))
+        self.assertEqual(compile_path("NAD[SU]/1/2").get(first.segments[4]), "9")
+        with self.assertRaises(TypeError):
+            extract(object(), "BGM/1")
+
+    def test_token_stream_matches_tree(self):
+        """Test that extracting from a token stream gives the same values as from the parsed tree."""
+        rng = random.Random(11)
+        expressions = ["NAD[BY]/1/0", "NAD/1/2", "BGM/1", "DTM[137]/0/1", "UNH/1/3", "NAD[SU]/2", "DTM/0/2"]
+        expressions += [f"{rng.choice(['NAD', 'DTM', 'BGM'])}/{rng.randrange(3)}/{rng.randrange(3)}" for _ in range(20)]
+        for data in (DATA, DATA[:-15], DATA[:-20]):
+            stream = Tokenizer(data).tokenize_stream()
+            segments = [segment for segment in Parser(Tokenizer(data).tokenize()).iter_segments()]
+            for expression in expressions:
+                path = compile_path(expression)
+                expected = [v for v in map(path.get, (s for s in segments if s.tag == path.tag)) if v is not None]
+                self.assertEqual(extract(stream, expression), expected, expression)
+                self.assertEqual(extract_first(stream, expression), expected[0] if expected else None)
+                if data is DATA:
+                    self.assertEqual(extract(Parser(Tokenizer(data).tokenize()).parse(), expression), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
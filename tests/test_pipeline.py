@@ -0,0 +1,64 @@
+import io
+import unittest
+from yapep.ast import Visitor
+from yapep.parser import Parser
+from yapep.pipeline import run_pipeline
+from yapep.tokenizer import Tokenizer
+
+
+DATA = "UNA:+.? '" + "".join(
+    f"UNB+UNOC:3+S+R+{i}'"
+    + "".join(f"UNH+{m}+INVOIC:D:96A:UN'BGM+380+{i}-{m}'MOA+77:{m}.5'UNT+4+{m}'" for m in range(20))
+    + f"UNZ+20+{i}'"
+    for i in range(5)
+)
+
+
+class Collector(Visitor):
+    def __init__(self):
+        self.seen = []
+
+    def visit_message(self, message):
+        self.seen.append(message.header.elements[0].components[0].value)
+
+    def visit_segment(self, segment):
+        self.seen.append(segment.tag)
+
+    def visit_component(self, component):
+        self.seen.append(component.value)
+
+
+class TestPipeline(unittest.TestCase):
+    def test_same_visits_as_sequential(self):
+        """Test that the pipeline visits the same nodes in the same order."""
+        expected = Collector()
+        for interchange in Parser(Tokenizer(DATA).tokenize()).parse().interchanges:
+            for message in interchange.messages:
+                message.accept(expected)
+
+        visitor = Collector()
+        count = run_pipeline(io.BytesIO(DATA.encode('latin-1')), visitor, chunk_size=37, maxsize=2)
+        self.assertEqual(count, 100)
+        self.assertEqual(visitor.seen, expected.seen)
+
+    def test_visitor_error(self):
+        """Test that an error raised by the visitor stops the pipeline and is re-raised."""
+        class Failing(Visitor):
+            def visit_message(self, message):
+                raise KeyError("boom")
+
+        with self.assertRaises(KeyError):
+            run_pipeline(io.StringIO(DATA), Failing(), chunk_size=16, maxsize=1)
+
+    def test_source_error(self):
+        """Test that an error raised while reading the input is re-raised."""
+        def chunks():
+            yield DATA[:200]
+            raise OSError("connection reset")
+
+        with self.assertRaises(OSError):
+            run_pipeline(chunks(), Visitor())
+
+
+if __name__ == '__main__':
+    unittest.main()
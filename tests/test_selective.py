@@ -0,0 +1,68 @@
+import unittest
+from yapep.tokenizer import Tokenizer
+from yapep.parser import Parser
+from yapep.selective import parse_selected, iter_selected
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+S+R+240101:1200+1'"
+    "UNH+1+INVOIC:D:96A:UN'BGM+380+INV?'1'UNT+3+1'"
+    "UNH+2+DESADV:D:96A:UN'BGM+351+D1'UNT+3+2'"
+    "UNH+3+INVOIC:D:96A:UN'BGM+380+INV2'UNT+3+3'"
+    "UNH+4+INVOIC:D:96A:UN'BGM+380+INV3'UNT+3+4'UNZ+4+1'"
+    "UNB+UNOC:3+S+R+240101:1200+2'UNH+5+ORDERS:D:96A:UN'BGM+220+O1'UNT+3+5'UNZ+1+2'"
+)
+
+
+def messages(edi_file):
+    return [message for interchange in edi_file.interchanges for message in interchange.messages]
+
+
+class TestSelective(unittest.TestCase):
+    def test_types(self):
+        """Test that only messages of the given types are parsed."""
+        full = Parser(Tokenizer(DATA).tokenize()).parse()
+        for data in (DATA, DATA.encode()):
+            selected = parse_selected(data, types={"INVOIC"})
+            self.assertEqual(messages(selected), [messages(full)[i] for i in (0, 2, 3)])
+            self.assertEqual(selected.una, full.una)
+            self.assertEqual([(i.header, i.trailer) for i in selected.interchanges],
+                             [(i.header, i.trailer) for i in full.interchanges])
+            self.assertEqual(selected.interchanges[1].messages, [])
+            self.assertEqual(parse_selected(data), full)
+
+    def test_predicate(self):
+        """Test selecting by a predicate on the UNH and UNB headers."""
+        def second_interchange(unh, unb):
+            return unb.elements[4].components[0].value == "2"
+
+        found = list(iter_selected(DATA, predicate=second_interchange))
+        self.assertEqual([m.header.elements[0].components[0].value for m in found], ["5"])
+        found = list(iter_selected(DATA, types=["INVOIC", "DESADV"],
+                                   predicate=lambda unh, unb: unh.elements[0].components[0].value != "3"))
+        self.assertEqual([m.header.elements[0].components[0].value for m in found], ["1", "2", "4"])
+        self.assertEqual(found[0].segments[0].elements[1].components[0].value, "INV'1")
+
+    def test_escaped_header(self):
+        """Test headers with release characters and a missing UNZ."""
+        data = "UNB+UNOC:3+S?+X+R+1'UNH+1+INVOIC'BGM+380'UNT+3+1'UNH+2+INV?'OIC'BGM+1'UNT+3+2'"
+        selected = parse_selected(data, types={"INV'OIC"})
+        full = Parser(Tokenizer(data).tokenize(), recover=True).parse()
+        self.assertEqual(selected.interchanges[0].header, full.interchanges[0].header)
+        self.assertIsNone(selected.interchanges[0].trailer)
+        self.assertEqual([m.header.elements[0].components[0].value for m in messages(selected)], ["2"])
+
+
+    def test_header_charset(self):
+        """Test that the UNB is decoded with the charset it names."""
+        text = "UNB+UNOW:3+Müller+Łódź+1'UNH+1+INVOIC'FTX+Grüße'UNT+3+1'UNZ+1+1'"
+        selected = parse_selected(text.encode('utf-8'))
+        self.assertEqual(selected, Parser(Tokenizer(text).tokenize()).parse())
+        self.assertEqual(selected.interchanges[0].header.elements[1].components[0].value, "Müller")
+        found = list(iter_selected(text.encode('utf-8'),
+                                   predicate=lambda unh, unb: unb.elements[2].components[0].value == "Łódź"))
+        self.assertEqual(len(found), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import os
+import tempfile
+import unittest
+from yapep.tokenizer import Tokenizer
+from yapep.parser import Parser
+from yapep import snapshot
+from yapep.snapshot import SnapshotMessage
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOW:3+S+R+240101:1200+1'"
+    "UNH+1+INVOIC:D:96A:UN'BGM+380+INV?'1'NAD+BY++Müller:X'UNT+4+1'"
+    "UNH+2+INVOIC:D:96A:UN'UNT+2+2'UNZ+2+1'"
+    "UNB+UNOW:3+S+R+240101:1200+2'UNH+3+ORDERS:D:96A:UN'BGM+220'UNT+3+3'UNZ+1+2'"
+)
+
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'file.snap')
+
+    def test_round_trip(self):
+        """Test that a loaded snapshot equals the parsed file."""
+        edi_file = Parser(Tokenizer(DATA).tokenize()).parse()
+        snapshot.dump(edi_file, self.path)
+        loaded = snapshot.load(self.path)
+        self.assertEqual(loaded, edi_file)
+        self.assertEqual(edi_file, loaded)
+        message = loaded.interchanges[0].messages[0]
+        self.assertEqual(message.find("NAD").elements[2].components[0].value, "Müller")
+        self.assertEqual(message.segments[0].elements[1].components[0].value, "INV'1")
+        self.assertEqual(loaded.interchanges[0].messages[1].segments, [])
+        self.assertEqual(loaded.una, edi_file.una)
+
+    def test_lazy(self):
+        """Test that messages are only built when read."""
+        snapshot.dump(Parser(Tokenizer(DATA).tokenize()).parse(), self.path)
+        loaded = snapshot.load(self.path)
+        message = loaded.interchanges[1].messages[0]
+        self.assertIsInstance(message, SnapshotMessage)
+        self.assertIsNone(message._segments)
+        self.assertIsNone(message._header)
+        self.assertEqual(message.header.elements[1].components[0].value, "ORDERS")
+        self.assertIsNone(message._segments)
+        self.assertEqual(message.segments[0].tag, "BGM")
+        self.assertIs(message.segments, message._segments)
+
+        # strings are decoded one by one, as the nodes using them are built
+        strings = message._snapshot._strings
+        self.assertIn(None, strings)
+        self.assertNotIn("Müller", strings)
+        self.assertEqual(loaded.interchanges[0].messages[0].find("NAD").elements[2].components[0].value, "Müller")
+        self.assertIn("Müller", strings)
+
+    def test_missing_segments(self):
+        """Test snapshots of files without UNA or with missing trailers."""
+        text = "UNB+UNOA:1+S+R+1'UNH+1+X'BGM+1'UNH+2+X'BGM+2"
+        parser = Parser(Tokenizer(text).tokenize(), recover=True)
+        edi_file = parser.parse()
+        snapshot.dump(edi_file, self.path)
+        loaded = snapshot.load(self.path)
+        self.assertEqual(loaded, edi_file)
+        self.assertIsNone(loaded.una)
+        self.assertIsNone(loaded.interchanges[0].trailer)
+        self.assertIsNone(loaded.interchanges[0].messages[0].trailer)
+
+    def test_invalid(self):
+        """Test that other and truncated files are rejected."""
+        with open(self.path, 'wb') as f:
+            f.write(b'UNA:+.? ' * 10)
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+        snapshot.dump(Parser(Tokenizer(DATA).tokenize()).parse(), self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 1)
+        with self.assertRaises(ValueError):
+            snapshot.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
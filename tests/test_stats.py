@@ -0,0 +1,110 @@
+import logging
+import unittest
+from yapep.ast import Visitor
+from yapep.tokenizer import Tokenizer, StreamTokenizer
+from yapep.parser import Parser
+from yapep.stats import ParseStats, log_sink
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+S+R+240101:1200+1'"
+    "UNH+1+INVOIC:D:96A:UN'BGM+380+INV?'1'MOA+77:100.50'UNT+4+1'"
+    "UNH+2+INVOIC:D:96A:UN'FTX+A??B'UNT+3+2'UNZ+2+1'"
+)
+
+
+class _Segments(Visitor):
+    def __init__(self):
+        self.count = 0
+
+    def visit_segment(self, segment):
+        self.count += 1
+
+
+class TestStats(unittest.TestCase):
+    def test_parse(self):
+        """Test the counts collected by tokenize_stream() and parse()."""
+        stats = ParseStats()
+        stream = Tokenizer(DATA.encode(), stats=stats).tokenize_stream()
+        Parser(stream, stats=stats).parse()
+        self.assertEqual(stats.bytes, len(DATA))
+        self.assertEqual(stats.tokens, len(stream))
+        self.assertEqual(stats.escapes, 2)
+        self.assertEqual(stats.segments, 10)
+        self.assertEqual(stats.messages, 2)
+        self.assertEqual(stats.largest_message, 4)
+        self.assertEqual(set(stats.phases), {"tokenize", "parse"})
+        self.assertEqual(stats.phases["parse"].calls, 1)
+        self.assertGreaterEqual(stats.phases["tokenize"].wall, 0)
+
+    def test_streaming(self):
+        """Test that streaming collects the same counts as parse()."""
+        expected = ParseStats()
+        Parser(Tokenizer(DATA, stats=expected).tokenize(), stats=expected).parse()
+
+        stats = ParseStats()
+        list(Parser(Tokenizer(DATA).tokenize(), stats=stats).iter_messages())
+        self.assertEqual((stats.segments, stats.messages, stats.largest_message),
+                         (expected.segments, expected.messages, expected.largest_message))
+        self.assertEqual(stats.phases["parse"].calls, 1)
+
+        stats = ParseStats()
+        tokenizer = StreamTokenizer(stats=stats)
+        parser = Parser([], stats=stats)
+        messages = []
+        for i in range(0, len(DATA), 7):
+            messages += parser.feed(tokenizer.feed(DATA[i:i + 7]))
+        messages += parser.feed(tokenizer.close()) + parser.close()
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(stats.bytes, len(DATA))
+        self.assertEqual((stats.tokens, stats.escapes), (expected.tokens, expected.escapes))
+        self.assertEqual((stats.segments, stats.messages, stats.largest_message),
+                         (expected.segments, expected.messages, expected.largest_message))
+
+    def test_bytes_and_escapes(self):
+        """Test that both tokenizers count every input character and only data escapes."""
+        for text in ("\n" + DATA + "\n\n", DATA.replace("UNA:+.? '", "")):
+            counts = set()
+            for tokenize in (lambda stats: Tokenizer(text, stats=stats).tokenize(),
+                             lambda stats: Tokenizer(text.encode(), stats=stats).tokenize_stream()):
+                stats = ParseStats()
+                tokenize(stats)
+                counts.add((stats.bytes, stats.tokens, stats.escapes))
+            for size in (1, 4, 50):
+                stats = ParseStats()
+                tokenizer = StreamTokenizer(stats=stats)
+                for i in range(0, len(text), size):
+                    tokenizer.feed(text[i:i + size])
+                tokenizer.close()
+                counts.add((stats.bytes, stats.tokens, stats.escapes))
+            self.assertEqual(len(counts), 1, counts)
+            self.assertEqual(counts.pop()[::2], (len(text), 2))
+
+    def test_visit_and_sinks(self):
+        """Test visit() and that sinks hear about every finished phase."""
+        stats = ParseStats()
+        heard = []
+        stats.add_sink(lambda name, spent, collected: heard.append((name, spent.calls, collected)))
+        edi_file = Parser(Tokenizer(DATA).tokenize(), stats=stats).parse()
+        visitor = _Segments()
+        stats.visit(edi_file, visitor)
+        self.assertEqual(visitor.count, 3)  # message bodies only
+        self.assertEqual(heard, [("parse", 1, stats), ("visit", 1, stats)])
+        self.assertEqual(stats.as_dict()["phases"]["visit"]["calls"], 1)
+
+        with self.assertLogs("yapep", logging.INFO) as logs:
+            stats.add_sink(log_sink())
+            stats.visit(edi_file, visitor)
+        self.assertIn("visit:", logs.output[0])
+
+    def test_disabled(self):
+        """Test that parsing without stats leaves no trace."""
+        tokenizer = Tokenizer(DATA)
+        parser = Parser(tokenizer.tokenize())
+        self.assertIsNone(tokenizer.stats)
+        self.assertIsNone(parser.stats)
+        self.assertEqual(len(parser.parse().interchanges), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,17 @@
+import io
+import os
+import random
+import tempfile
 import unittest
-from yapep.tokenizer import Tokenizer, Token, TokenType
+from yapep.tokenizer import Tokenizer, StreamTokenizer, Token, TokenType, TokenStream, iter_tokens
+from yapep.parser import Parser
+
+
+class SlowTokenizer(Tokenizer):
+    """Reference tokenizer that scans every character."""
+
+    def _scan(self, data, i, length, final):
+        return self._scan_slow(data, i, length, final)
 
 
 class TestTokenizer(unittest.TestCase):
@@ -124,6 +136,132 @@ class TestTokenizer(unittest.TestCase):
         self.assertEqual(tokens[7].type, TokenType.COMPONENT_DATA)
         self.assertEqual(tokens[7].value, "456")
 
+        # released whitespace is kept, at the end of a segment too
+        tokens = Tokenizer("FTX+A? B? '").tokenize()
+        self.assertEqual(tokens[-2].value, "A B ")
+        self.assertEqual(Tokenizer.from_buffer(b"FTX+A? B? '").tokenize_stream().value(len(tokens) - 2), "A B ")
+
+    def test_stream_matches_tokenize(self):
+        """Test that feeding chunks of any size yields the same tokens as tokenize()."""
+        samples = [
+            "SEG+123:456'SEG+789'",
+            "UNA:+.? '\nUNB+UNOA:1+SENDER'\nUNH+1+ORDERS:D:96A'FTX+AAA+12?'3??'UNT+3+1'",
+            "  UNA*#.! ~SEG#1*2#a!~b~SEG#c !  ~  \n",
+            "SEG+value?",
+            "SEG+a? ",
+            "FTX+A? ? 'NAD+?\tB?\t'",
+            "SEG+no+terminator",
+        ]
+        for data in samples:
+            expected = Tokenizer(data).tokenize()
+            for size in (1, 2, 3, 5, 8, 64):
+                tokenizer = StreamTokenizer()
+                tokens = []
+                for i in range(0, len(data), size):
+                    tokens.extend(tokenizer.feed(data[i:i + size]))
+                tokens.extend(tokenizer.close())
+                self.assertEqual(tokens, expected, f"chunk size {size}: {data!r}")
+
+    def test_iter_tokens(self):
+        """Test streaming tokens from text and binary file objects."""
+        data = "UNA:+.? 'UNB+UNOC:3'UNH+1+ORDERS'NAD+BY+Müller'UNT+3+1'UNZ+1+1'"
+        expected = Tokenizer(data).tokenize()
+
+        self.assertEqual(list(iter_tokens(io.StringIO(data), chunk_size=4)), expected)
+        binary = io.BytesIO(data.encode('utf-8'))
+        self.assertEqual(list(iter_tokens(binary, chunk_size=3, encoding='utf-8')), expected)
+        self.assertEqual(list(iter_tokens([data[:10], data[10:]])), expected)
+
+    def test_fast_path_matches_slow_scan(self):
+        """Test that the bulk split produces the same tokens as the character scan on random inputs."""
+        rng = random.Random(9735)
+        alphabet = "ABC123:+'?* #~!\n\t"
+        for _ in range(2000):
+            body = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            data = rng.choice(["", "UNA:+.? '", "UNA*#.! ~", " UNA:+.? '\n"]) + body
+            expected = SlowTokenizer(data).tokenize()
+            self.assertEqual(Tokenizer(data).tokenize(), expected, repr(data))
+
+            tokenizer = StreamTokenizer()
+            tokens = []
+            i = 0
+            while i < len(data):
+                size = rng.randint(1, 10)
+                tokens.extend(tokenizer.feed(data[i:i + size]))
+                i += size
+            tokens.extend(tokenizer.close())
+            self.assertEqual(tokens, expected, repr(data))
+
+    def test_tokenize_stream(self):
+        """Test that the array-backed stream holds the same tokens as tokenize()."""
+        data = "UNA:+.? '\nUNB+UNOA:1+S'\nNAD+BY+JOHN SMITH+12?+3'FTX+AAA+a?'b::c'SEG"
+        stream = Tokenizer(data).tokenize_stream()
+
+        self.assertIsInstance(stream, TokenStream)
+        self.assertEqual(stream.types.typecode, 'B')
+        self.assertEqual(stream.starts.typecode, 'I')
+        self.assertEqual(list(stream), Tokenizer(data).tokenize())
+        self.assertEqual(stream.type(0), TokenType.SEGMENT_TAG)
+        self.assertEqual(stream.value(7), "UNB")
+        self.assertEqual(stream[-1], Token(TokenType.SEGMENT_TAG, "SEG"))
+
+    def test_tokenize_stream_random(self):
+        """Test the stream spans against tokenize() on random inputs."""
+        rng = random.Random(14)
+        alphabet = "ABC123:+'?* #~!\n"
+        for _ in range(1000):
+            body = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            data = rng.choice(["", "UNA:+.? '", "UNA*#.! ~"]) + body
+            self.assertEqual(list(Tokenizer(data).tokenize_stream()), Tokenizer(data).tokenize(), repr(data))
+
+    def test_from_buffer(self):
+        """Test that raw bytes give the same tokens as decoded text."""
+        rng = random.Random(7)
+        alphabet = "ABC123:+'?* #~!\néß\xa0"
+        for _ in range(1000):
+            body = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60)))
+            text = rng.choice(["", "UNA:+.? '", "UNA*#.! ~"]) + body
+            if text.endswith('\xa0'):
+                continue  # str.strip() drops it, the byte scan only skips ASCII whitespace
+            expected = Tokenizer(text).tokenize()
+            for raw in (text.encode('latin-1'), memoryview(text.encode('latin-1'))):
+                self.assertEqual(Tokenizer.from_buffer(raw, 'latin-1').tokenize(), expected, repr(text))
+
+    def test_charset_from_unb(self):
+        """Test that values are decoded with the charset named in UNB."""
+        text = "UNA:+.? '\nUNB+UNOY:4+SENDER+RECEIVER'\nNAD+BY++Łódź Straße+Köln?+Bonn'"
+        stream = Tokenizer.from_buffer(text.encode('utf-8')).tokenize_stream()
+        self.assertEqual(stream.encoding, 'utf-8')
+        self.assertEqual(list(stream), Tokenizer(text).tokenize())
+
+        stream = Tokenizer.from_buffer("UNB+UNOC:3'NAD+Köln'".encode('latin-1')).tokenize_stream()
+        self.assertEqual(stream.encoding, 'latin-1')
+        self.assertEqual(stream.value(8), "Köln")
+
+        stream = Tokenizer.from_buffer(b"UNB+UNOA:1'NAD+K\xf6ln'").tokenize_stream()
+        self.assertEqual(stream.value(8), "Köln")  # stray 8-bit byte under UNOA
+
+    def test_from_path(self):
+        """Test tokenizing a memory-mapped file and closing the mapping."""
+        text = "UNA:+.? 'UNB+UNOW:4+S+R'UNH+1+ORDERS'FTX+AAA+Grüße'UNT+3+1'UNZ+1+1'\n"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'orders.edi')
+            with open(path, 'wb') as f:
+                f.write(text.encode('utf-8'))
+            with Tokenizer.from_path(path) as tokenizer:
+                self.assertEqual(tokenizer.tokenize(), Tokenizer(text).tokenize())
+            with Tokenizer.from_path(path) as tokenizer:
+                stream = tokenizer.tokenize_stream()
+                self.assertEqual(Parser(stream).parse(), Parser(Tokenizer(text).tokenize()).parse())
+            with self.assertRaises(ValueError):  # the mapping is closed
+                stream.value(len(stream) - 1)
+            tokenizer.close()  # closing twice is harmless
+
+            empty = os.path.join(tmp, 'empty.edi')
+            open(empty, 'wb').close()
+            with Tokenizer.from_path(empty) as tokenizer:
+                self.assertEqual(tokenizer.tokenize(), [])
+
 
 if __name__ == '__main__':
     unittest.main()
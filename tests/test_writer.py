@@ -0,0 +1,102 @@
+import io
+import unittest
+from yapep.tokenizer import Tokenizer, Delimiters
+from yapep.parser import Parser
+from yapep.ast import Message, Segment, Element, Component
+from yapep.writer import Writer
+
+
+DATA = (
+    "UNA:+.? 'UNB+UNOC:3+SENDER+RECEIVER+240101:1200+REF42'"
+    "UNH+1+ORDERS:D:96A:UN'BGM+220+PO1+9'DTM+137:20240101:102'FTX+AAI+++O?'Brien??:x'"
+    "FTX+A? B'NAD+BY+5412345000013::9'NAD+SU++'UNT+8+1'"
+    "UNH+2+ORDERS:D:96A:UN'BGM+220+PO2+9'UNT+3+2'"
+    "UNZ+2+REF42'"
+)
+
+
+def parse(data):
+    return Parser(Tokenizer(data).tokenize()).parse()
+
+
+def segment(tag, *elements):
+    return Segment(tag, [Element([Component(value) for value in element.split(':')]) for element in elements])
+
+
+class TestWriter(unittest.TestCase):
+    def test_round_trip(self):
+        """Test that parse -> write -> parse gives the same tree and the same text."""
+        edi_file = parse(DATA)
+        out = io.StringIO()
+        with Writer(out) as writer:
+            writer.write(edi_file)
+        self.assertEqual(out.getvalue(), DATA)
+        self.assertEqual(parse(out.getvalue()), edi_file)
+
+    def test_delimiters_and_binary_sink(self):
+        """Test writing with custom UNA delimiters to a binary sink in the UNB charset."""
+        edi_file = parse(DATA.replace("PO2", "Köln"))
+        delimiters = Delimiters('|', '*', ',', '!', '~', '#')
+        out = io.BytesIO()
+        with Writer(out, delimiters, newline='\n') as writer:
+            writer.write(edi_file)
+        data = out.getvalue()
+        self.assertTrue(data.startswith(b"UNA|*,!~#\nUNB*UNOC|3*SENDER"))
+        self.assertIn("Köln".encode('latin-1'), data)
+        self.assertIn(b"O'Brien?|x", data)
+        stream = Tokenizer.from_buffer(data).tokenize_stream()
+        self.assertEqual(Parser(stream).parse(), edi_file)
+
+    def test_escaping(self):
+        """Test that service characters in values are released."""
+        out = io.StringIO()
+        with Writer(out, newline='\n') as writer:
+            writer.write(Segment("FTX", [Element([Component("A+B"), Component("C:D'E?")]), Element([Component("")])]))
+        self.assertEqual(out.getvalue(), "FTX+A?+B:C?:D?'E??+'\n")
+
+        out = io.StringIO()
+        with Writer(out) as writer:
+            writer.write(Segment("FTX", [Element([Component(" A\tB\n\u3000")])]))
+        self.assertEqual(out.getvalue(), "FTX+? A?\tB?\n?\u3000'")
+        self.assertEqual(Tokenizer(out.getvalue()).tokenize()[-2].value, " A\tB\n\u3000")
+
+    def test_control_characters(self):
+        """Test that values holding the placeholder characters are rejected, not split."""
+        for char in "\x1d\x1e\x1f":
+            out = io.StringIO()
+            writer = Writer(out)
+            with self.assertRaises(ValueError):
+                writer.write(Segment("FTX", [Element([Component("A" + char + "B")])]))
+            with self.assertRaises(ValueError):
+                writer.write_message(Message(header=segment("UNH", "1", "ORDERS"), trailer=None,
+                                             segments=[Segment("FTX", [Element([Component("x"), Component(char)])])]))
+            writer.write(Segment("FTX", [Element([]), Element([Component("A"), Component("B")])]))
+            writer.close()
+            self.assertEqual(out.getvalue(), "FTX++A:B'")
+
+    def test_counts(self):
+        """Test that UNT segment counts and UNZ message counts are filled in."""
+        out = io.StringIO()
+        writer = Writer(out, buffer_size=64)
+        writer.start_interchange(segment("UNB", "UNOA:1", "S", "R", "240101:1200", "7"))
+        for number in range(1, 4):
+            writer.write_message(Message(
+                header=segment("UNH", str(number), "INVOIC:D:96A:UN"),
+                trailer=None,
+                segments=[segment("BGM", "380", f"INV{number}")] * number,
+            ))
+        writer.close()
+        edi_file = parse(out.getvalue())
+        interchange = edi_file.interchanges[0]
+        self.assertEqual([c.value for e in interchange.trailer.elements for c in e.components], ["3", "7"])
+        for number, message in enumerate(interchange.messages, 1):
+            self.assertEqual(message.trailer.elements[0].components[0].value, str(number + 2))
+            self.assertEqual(message.trailer.elements[1].components[0].value, str(number))
+        with self.assertRaises(ValueError):
+            writer.end_interchange()
+        with self.assertRaises(TypeError):
+            writer.write(Component("x"))
+
+
+if __name__ == '__main__':
+    unittest.main()
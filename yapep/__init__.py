@@ -1,3 +1,15 @@
-from .ast import Node, File, Interchange, Message, Segment, Element, Component, Visitor
-from .parser import Parser
-from .tokenizer import Tokenizer
+from .ast import Node, File, Interchange, Message, Segment, Element, Component, Visitor, Signal, SKIP_CHILDREN, STOP
+from .parser import Parser, Diagnostic
+from .tokenizer import Tokenizer, StreamTokenizer, iter_tokens
+from .parallel import parse_parallel, iter_parallel
+from .pipeline import run_pipeline
+from .path import compile_path, extract, extract_first
+from .writer import Writer
+from .ndjson import export_ndjson, iter_ndjson
+from .columnar import SegmentTable, segment_table
+from .aio import aparse
+from .stats import ParseStats, log_sink
+from .intern import InternPool
+from .cache import ParseCache
+from .selective import parse_selected, iter_selected
+from .indexed import IndexedFile, build_index, open_indexed
@@ -0,0 +1,59 @@
+import asyncio
+import codecs
+from concurrent.futures import Executor
+from typing import AsyncIterable, AsyncIterator, List
+
+from .ast import Message
+from .parser import Parser
+from .tokenizer import StreamTokenizer
+
+
+async def aparse(source: asyncio.StreamReader | AsyncIterable[bytes | str], chunk_size: int = 1 << 16,
+                 encoding: str = 'latin-1', executor: Executor | None = None) -> AsyncIterator[Message]:
+    # Async counterpart of Parser(iter_tokens(...)).iter_messages(). Input
+    # is handled at most chunk_size bytes at a time (larger chunks from an
+    # iterator are split), and control goes back to the event loop after
+    # each piece, or the piece is tokenized and parsed in executor instead.
+    # The next chunk is only read once the messages of the previous one
+    # have been consumed, so a slow consumer leaves data in the reader and
+    # the transport's flow control holds back the sender.
+    tokenizer = StreamTokenizer()
+    parser = Parser([])
+    decoder = codecs.getincrementaldecoder(encoding)()
+    loop = asyncio.get_running_loop()
+
+    async for chunk in _chunks(source, chunk_size):
+        if not isinstance(chunk, str):
+            chunk = decoder.decode(chunk)
+        if executor is None:
+            messages = _step(tokenizer, parser, chunk, False)
+            await asyncio.sleep(0)
+        else:
+            messages = await loop.run_in_executor(executor, _step, tokenizer, parser, chunk, False)
+        for message in messages:
+            yield message
+
+    for message in _step(tokenizer, parser, decoder.decode(b'', final=True), True):
+        yield message
+
+
+def _step(tokenizer: StreamTokenizer, parser: Parser, text: str, final: bool) -> List[Message]:
+    messages = parser.feed(tokenizer.feed(text))
+    if final:
+        messages += parser.feed(tokenizer.close())
+        messages += parser.close()
+    return messages
+
+
+async def _chunks(source: asyncio.StreamReader | AsyncIterable[bytes | str],
+                  chunk_size: int) -> AsyncIterator[bytes | str]:
+    if isinstance(source, asyncio.StreamReader):
+        while True:
+            chunk = await source.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        async for chunk in source:
+            for start in range(0, len(chunk), chunk_size):
+                yield chunk[start:start + chunk_size]
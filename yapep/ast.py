@@ -1,95 +1,280 @@
-from typing import List, TypeVar, Any
-from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, List, Tuple, TypeVar
+from dataclasses import dataclass, field
 
 _T = TypeVar("_T")
 
 
+class Signal(Enum):
+    # returned by a visit_* method to steer the traversal
+    SKIP_CHILDREN = 1  # do not descend into this node
+    STOP = 2  # end the traversal
+
+
+SKIP_CHILDREN = Signal.SKIP_CHILDREN
+STOP = Signal.STOP
+
+
 class Node:
-    def accept(self, visitor: "Visitor") -> Any:
-        ...
+    __slots__ = ()
+    _depth = -1  # level in the tree, from File (0) to Component (5)
 
+    def accept(self, visitor: "Visitor") -> Signal | None:
+        # Pre-order walk with an explicit stack. It never goes deeper than the
+        # deepest visit_* method the visitor overrides, so a visitor that only
+        # counts messages never reaches segments, and methods left to the
+        # Visitor defaults are not called. The last two levels are visited
+        # in plain loops instead of going through the stack. Returns STOP if a
+        # visit_* method ended the traversal.
+        overridden = _overridden(type(visitor))
+        limit = len(overridden) - 1
+        if self._depth > limit:
+            return None
+        methods = [getattr(visitor, name) if wanted else None
+                   for name, wanted in zip(_VISIT_METHODS, overridden)]
+        leaf = methods[limit]
+        stack = [self]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            node = pop()
+            depth = node._depth
+            visit = methods[depth]
+            if visit is not None:
+                signal = visit(node)
+                if signal is STOP:
+                    return STOP
+                if signal is SKIP_CHILDREN:
+                    continue
+            if depth + 2 < limit:
+                extend(reversed(node._children()))
+            elif depth + 2 == limit:
+                inner = methods[depth + 1]
+                for child in node._children():
+                    if inner is not None:
+                        signal = inner(child)
+                        if signal is STOP:
+                            return STOP
+                        if signal is SKIP_CHILDREN:
+                            continue
+                    for grandchild in child._children():
+                        if leaf(grandchild) is STOP:
+                            return STOP
+            elif depth < limit:
+                for child in node._children():
+                    if leaf(child) is STOP:
+                        return STOP
+        return None
 
-@dataclass
+    def _children(self) -> List["Node"]:
+        return []
+
+
+@dataclass(slots=True)
 class Scoped(Node):
     header: 'Segment'  # started segment
     trailer: 'Segment'  # end segment
 
 
-@dataclass
+@dataclass(slots=True)
 class Component(Node):
     value: str
 
-    def accept(self, visitor: "Visitor") -> None:
-        visitor.visit_component(self)
+    _depth = 5
 
 
-@dataclass
+@dataclass(slots=True)
 class Element(Node):
     components: List[Component]
 
-    def accept(self, visitor: "Visitor") -> None:
-        visitor.visit_element(self)
-        for component in self.components:
-            component.accept(visitor)
+    _depth = 4
+
+    def _children(self) -> List[Node]:
+        return self.components
+
 
+class FlatElement(Element):
+    # Element holding exactly one component, stored in the inherited slot
+    # instead of a one-item list. components is a read-only tuple; the
+    # element compares equal to an Element with the same component.
+    __slots__ = ()
 
-@dataclass
+    def __init__(self, component: Component):
+        _components_slot.__set__(self, component)
+
+    @property
+    def components(self) -> tuple:
+        return (_components_slot.__get__(self),)
+
+    def __eq__(self, other):
+        if isinstance(other, Element):
+            return list(self.components) == list(other.components)
+        return NotImplemented
+
+    def __reduce__(self):
+        # the inherited slots __setstate__ would assign to the read-only
+        # property, so pickle and copy rebuild through __init__ instead
+        return FlatElement, (_components_slot.__get__(self),)
+
+
+_components_slot = Element.__dict__['components']
+
+
+@dataclass(slots=True)
 class Segment(Node):
     tag: str
     elements: List[Element]
 
-    def accept(self, visitor: "Visitor") -> None:
-        visitor.visit_segment(self)
-        for element in self.elements:
-            element.accept(visitor)
+    _depth = 3
+
+    def _children(self) -> List[Node]:
+        return self.elements
+
 
+def _qualifier(segment: Segment) -> str | None:
+    # value of the first component of the first element, e.g. BY in NAD+BY
+    elements = segment.elements
+    if elements and elements[0].components:
+        return elements[0].components[0].value
+    return None
 
-@dataclass
+
+def _matching(segments: List[Segment], qualifier: str | None) -> List[Segment]:
+    if qualifier is None:
+        return list(segments)
+    return [segment for segment in segments if _qualifier(segment) == qualifier]
+
+
+@dataclass(slots=True)
 class Message(Scoped):
     segments: List[Segment]
+    # tag -> positions in segments; filled in by the Parser, or on the first
+    # query for hand-built messages. Call reindex() after editing segments.
+    _index: Dict[str, List[int]] | None = field(default=None, init=False, repr=False, compare=False)
+
+    _depth = 2
+
+    def _children(self) -> List[Node]:
+        return self.segments
 
-    def accept(self, visitor: "Visitor") -> None:
-        visitor.visit_message(self)
-        for segment in self.segments:
-            segment.accept(visitor)
+    def find(self, tag: str, qualifier: str | None = None) -> Segment | None:
+        segments = self.segments
+        for position in self._positions(tag):
+            if qualifier is None or _qualifier(segments[position]) == qualifier:
+                return segments[position]
+        return None
 
+    def segments_by_tag(self, tag: str, qualifier: str | None = None) -> List[Segment]:
+        segments = self.segments
+        return _matching([segments[position] for position in self._positions(tag)], qualifier)
 
-@dataclass
+    def reindex(self) -> None:
+        index = {}
+        for position, segment in enumerate(self.segments):
+            positions = index.get(segment.tag)
+            if positions is None:
+                index[segment.tag] = [position]
+            else:
+                positions.append(position)
+        self._index = index
+
+    def _positions(self, tag: str) -> List[int]:
+        if self._index is None:
+            self.reindex()
+        return self._index.get(tag, ())
+
+
+@dataclass(slots=True)
 class Interchange(Scoped):
     messages: List[Message]
 
-    def accept(self, visitor: "Visitor") -> None:
-        visitor.visit_interchange(self)
-        for msg in self.messages:
-            msg.accept(visitor)
+    _depth = 1
+
+    def _children(self) -> List[Node]:
+        return self.messages
 
 
-@dataclass
+@dataclass(slots=True)
 class File(Node):
     una: Segment | None  # headless
     interchanges: List[Interchange]
+    # tag -> segments of all message bodies in file order, merged from the
+    # message indexes on the first query; like Message.find, the UNB, UNZ,
+    # UNH and UNT envelopes are not included. Call reindex() after editing
+    # the tree.
+    _index: Dict[str, List[Segment]] | None = field(default=None, init=False, repr=False, compare=False)
 
-    def accept(self, visitor: "Visitor") -> None:
-        visitor.visit_file(self)
+    _depth = 0
+
+    def _children(self) -> List[Node]:
+        return self.interchanges
+
+    def find(self, tag: str, qualifier: str | None = None) -> Segment | None:
+        for segment in self._segments(tag):
+            if qualifier is None or _qualifier(segment) == qualifier:
+                return segment
+        return None
+
+    def segments_by_tag(self, tag: str, qualifier: str | None = None) -> List[Segment]:
+        return _matching(self._segments(tag), qualifier)
+
+    def reindex(self) -> None:
+        self._index = None
         for interchange in self.interchanges:
-            interchange.accept(visitor)
+            for message in interchange.messages:
+                message.reindex()
+
+    def _segments(self, tag: str) -> List[Segment]:
+        if self._index is None:
+            index = {}
+            for interchange in self.interchanges:
+                for message in interchange.messages:
+                    if message._index is None:
+                        message.reindex()
+                    segments = message.segments
+                    for name, positions in message._index.items():
+                        found = index.get(name)
+                        if found is None:
+                            found = index[name] = []
+                        found.extend([segments[position] for position in positions])
+            self._index = index
+        return self._index.get(tag, ())
 
 
 class Visitor:
-    def visit_file(self, file: File):
+    # visit_* methods may return SKIP_CHILDREN or STOP; levels below the
+    # deepest overridden method are not traversed at all.
+    def visit_file(self, file: File) -> Signal | None:
         ...
 
-    def visit_interchange(self, interchange: Interchange):
+    def visit_interchange(self, interchange: Interchange) -> Signal | None:
         ...
 
-    def visit_segment(self, segment: Segment):
+    def visit_segment(self, segment: Segment) -> Signal | None:
         ...
 
-    def visit_message(self, message: Message):
+    def visit_message(self, message: Message) -> Signal | None:
         ...
 
-    def visit_element(self, element: Element):
+    def visit_element(self, element: Element) -> Signal | None:
         ...
 
-    def visit_component(self, componen: Component):
+    def visit_component(self, componen: Component) -> Signal | None:
         ...
+
+
+_VISIT_METHODS = ("visit_file", "visit_interchange", "visit_message",
+                  "visit_segment", "visit_element", "visit_component")
+_overrides: Dict[type, Tuple[bool, ...]] = {}
+
+
+def _overridden(cls: type) -> Tuple[bool, ...]:
+    # for each level down to the deepest one cls has a visit_* method for,
+    # whether that method differs from the Visitor default
+    overridden = _overrides.get(cls)
+    if overridden is None:
+        overridden = tuple(getattr(cls, name, None) is not getattr(Visitor, name) for name in _VISIT_METHODS)
+        while overridden and not overridden[-1]:
+            overridden = overridden[:-1]
+        _overrides[cls] = overridden
+    return overridden
@@ -0,0 +1,71 @@
+import re
+import mmap
+from typing import Iterator, Tuple
+from .tokenizer import Delimiters
+
+SERVICE_TAGS = ("UNB", "UNH", "UNT", "UNZ")
+
+
+class BoundaryScanner:
+    # Finds service segments (UNB/UNH/UNT/UNZ) in raw text or bytes with a
+    # compiled pattern, without tokenizing anything in between. A match only
+    # counts when the terminator before it is not escaped.
+    def __init__(self, data: str | bytes | mmap.mmap | memoryview, delimiters: Delimiters = Delimiters(),
+                 tags: Tuple[str, ...] = SERVICE_TAGS):
+        self.data = data
+        self.delimiters = delimiters
+        binary = not isinstance(data, str)
+
+        def compile(pattern: str) -> re.Pattern:
+            # delimiters are single-byte, so the pattern encodes to latin-1
+            return re.compile(pattern.encode('latin-1') if binary else pattern)
+
+        whitespace = r'[\t-\r\x1c-\x20]*' if binary else r'\s*'
+        terminator = re.escape(delimiters.terminator)
+        tag = '(%s)(?=%s|%s|$)' % ('|'.join(map(re.escape, tags)), re.escape(delimiters.element), terminator)
+        self._first = compile(whitespace + tag)
+        self._next = compile(terminator + whitespace + tag)
+        self._terminator = compile(terminator)
+        self._release = ord(delimiters.release) if binary else delimiters.release
+        self._binary = binary
+
+    def boundaries(self, start: int = 0, end: int | None = None) -> Iterator[Tuple[str, int]]:
+        # (tag, offset of the tag) for every service segment in data[start:end]
+        data = self.data
+        end = len(data) if end is None else end
+        match = self._first.match(data, start, end)
+        if match:
+            yield self._tag(match), match.start(1)
+        pos = start
+        while True:
+            match = self._next.search(data, pos, end)
+            if match is None:
+                return
+            pos = match.start() + 1
+            if not self._escaped(match.start(), start):
+                yield self._tag(match), match.start(1)
+
+    def segment_end(self, offset: int, end: int | None = None) -> int:
+        # Index just past the terminator of the segment starting at offset
+        data = self.data
+        end = len(data) if end is None else end
+        pos = offset
+        while True:
+            match = self._terminator.search(data, pos, end)
+            if match is None:
+                return end
+            if not self._escaped(match.start(), offset):
+                return match.end()
+            pos = match.end()
+
+    def _escaped(self, index: int, start: int) -> bool:
+        # an odd run of release characters before index escapes it
+        data = self.data
+        k = index
+        while k > start and data[k - 1] == self._release:
+            k -= 1
+        return (index - k) % 2 == 1
+
+    def _tag(self, match: re.Match) -> str:
+        tag = match.group(1)
+        return str(tag, 'latin-1') if self._binary else tag
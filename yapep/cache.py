@@ -0,0 +1,138 @@
+import hashlib
+import mmap
+import os
+import tempfile
+from collections import OrderedDict
+from os import PathLike
+from typing import Tuple
+
+from .ast import File
+from .parser import Parser
+from .snapshot import dump, _Snapshot
+from .tokenizer import Tokenizer, Delimiters, detect_delimiters, map_file
+
+_TREE_BYTES = 40  # approximate memory of a parsed tree per input character
+
+
+class ParseCache:
+    # Parsed Files keyed by a hash of the input plus the delimiters and
+    # encoding it is read with, so a repeat skips tokenizing and parsing.
+    # The memory tier is an LRU bounded by max_bytes, estimated from the
+    # input size. With directory, entries are also written there in the
+    # snapshot format (see yapep.snapshot), which loads several times faster
+    # than a parse and is shared between processes and runs. The format is
+    # plain arrays and strings, so a tampered entry can at worst fail to
+    # load, which counts as a miss. Hits return the cached File itself:
+    # treat it as read-only.
+    def __init__(self, max_bytes: int = 256 << 20, directory: str | PathLike | None = None):
+        self.max_bytes = max_bytes
+        self.directory = os.fspath(directory) if directory is not None else None
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+        self._entries: OrderedDict[str, Tuple[File, int]] = OrderedDict()
+        self.size = 0  # estimated bytes held in memory
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def parse(self, data: str | bytes | mmap.mmap | memoryview, encoding: str | None = None,
+              delimiters: Delimiters | None = None) -> File:
+        key = self.key(data, encoding, delimiters)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        cost = len(data) * _TREE_BYTES
+        edi_file = self._load(key)
+        if edi_file is not None:
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+            edi_file = Parser(Tokenizer(data, encoding, delimiters).tokenize_stream()).parse()
+            self._store(key, edi_file)
+        self._remember(key, edi_file, cost)
+        return edi_file
+
+    def parse_path(self, path: str | PathLike, encoding: str | None = None,
+                   delimiters: Delimiters | None = None) -> File:
+        data = map_file(path)
+        try:
+            return self.parse(data, encoding, delimiters)
+        finally:
+            if isinstance(data, mmap.mmap):
+                data.close()
+
+    def key(self, data: str | bytes | mmap.mmap | memoryview, encoding: str | None = None,
+            delimiters: Delimiters | None = None) -> str:
+        # str and bytes input are told apart: bytes are decoded by charset
+        digest = hashlib.blake2b(digest_size=20)
+        if isinstance(data, str):
+            digest.update(b's')
+            digest.update(data.encode('utf-8', 'surrogatepass'))
+        else:
+            digest.update(b'b')
+            digest.update(data)
+        delimiters = delimiters or detect_delimiters(data) or Delimiters()
+        digest.update(f"\0{''.join(delimiters)}\0{encoding or ''}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def clear(self, disk: bool = False):
+        self._entries.clear()
+        self.size = 0
+        if disk and self.directory is not None:
+            for name in os.listdir(self.directory):
+                if name.endswith('.yapep-cache'):
+                    os.remove(os.path.join(self.directory, name))
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.disk_hits + self.misses
+        return (self.hits + self.disk_hits) / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "entries": len(self._entries), "size": self.size, "hits": self.hits, "disk_hits": self.disk_hits,
+            "misses": self.misses, "hit_rate": self.hit_rate,
+        }
+
+    def _remember(self, key: str, edi_file: File, cost: int):
+        if cost > self.max_bytes:
+            return
+        self._entries[key] = (edi_file, cost)
+        self.size += cost
+        while self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.yapep-cache')
+
+    def _load(self, key: str) -> File | None:
+        # read and built in full, so a damaged entry fails here and not later
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'rb') as f:
+                return _Snapshot(f.read()).file(lazy=False)
+        except Exception:
+            return None  # missing, unreadable or damaged; parsed again and rewritten
+
+    def _store(self, key: str, edi_file: File):
+        # written to a temporary file first so readers never see half an entry
+        if self.directory is None:
+            return
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        os.close(fd)
+        try:
+            dump(edi_file, temporary)
+            os.replace(temporary, self._path(key))
+        except BaseException:
+            os.remove(temporary)
+            raise
@@ -0,0 +1,157 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List
+
+from .ndjson import iter_ndjson
+from .parser import Parser
+from .tokenizer import Tokenizer, TokenType
+
+_SEGMENT_TAG = TokenType.SEGMENT_TAG.value
+
+
+@dataclass(slots=True)
+class FileResult:
+    path: str
+    size: int = 0
+    interchanges: int = 0
+    messages: int = 0
+    segments: int = 0
+    seconds: float = 0.0
+    ndjson: str = ''
+    error: str | None = None
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="yapep", description="Parse batches of EDI files.")
+    parser.add_argument('paths', nargs='+', help="files, directories or glob patterns")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('-f', '--format', choices=('summary', 'ndjson'), default='summary',
+                        help="print a line per file, or one JSON line per message")
+    parser.add_argument('-o', '--output', default='-', help="NDJSON output file (default: stdout)")
+    parser.add_argument('-p', '--pattern', default='*', help="file name pattern inside directories")
+    parser.add_argument('-q', '--quiet', action='store_true', help="only print the totals")
+    args = parser.parse_args(argv)
+
+    paths, missing = _expand(args.paths, args.pattern)
+    for path in missing:
+        print(f"yapep: no such file or pattern: {path}", file=sys.stderr)
+
+    ndjson = args.format == 'ndjson'
+    # in NDJSON mode stdout may carry the data, so statistics go to stderr
+    report = sys.stderr if ndjson else sys.stdout
+    output = None
+    if ndjson:
+        output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+
+    totals = FileResult(path='total')
+    files = 0
+    failures = len(missing)
+    start = time.perf_counter()
+    try:
+        for result in _map(paths, ndjson, args.workers):
+            if result.error is not None:
+                failures += 1
+                print(f"FAILED {result.path}: {result.error}", file=report)
+                continue
+            if output is not None:
+                output.write(result.ndjson)
+            files += 1
+            totals.size += result.size
+            totals.interchanges += result.interchanges
+            totals.messages += result.messages
+            totals.segments += result.segments
+            if not args.quiet:
+                print(_line(result, result.seconds), file=report)
+    except BrokenPipeError:
+        # output closed early, e.g. piped into head; keep the exit flush quiet
+        sys.stdout = open(os.devnull, 'w')
+        return 1
+    finally:
+        if output is not None and output is not sys.stdout:
+            output.close()
+    elapsed = time.perf_counter() - start
+
+    print(_line(totals, elapsed) + f" {files} files, {files / elapsed if elapsed else 0:.1f} files/s, "
+          f"{failures} failed", file=report)
+    return 1 if failures else 0
+
+
+def _expand(patterns: Iterable[str], pattern: str) -> tuple:
+    # regular files named by the arguments, in order and without repeats
+    paths = []
+    missing = []
+    seen = set()
+    for argument in patterns:
+        if os.path.isdir(argument):
+            found = sorted(glob.glob(os.path.join(glob.escape(argument), '**', pattern), recursive=True))
+        elif os.path.isfile(argument):
+            found = [argument]
+        else:
+            found = sorted(glob.glob(argument, recursive=True))
+        found = [path for path in found if os.path.isfile(path)]
+        if not found:
+            missing.append(argument)
+        for path in found:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths, missing
+
+
+def _map(paths: List[str], ndjson: bool, workers: int | None) -> Iterator[FileResult]:
+    # Results come back in path order; at most four files per worker are in
+    # flight.
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for path in paths:
+            yield _process(path, ndjson)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for path in paths:
+                pending.append(pool.submit(_process, path, ndjson))
+                if len(pending) >= workers * 4:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _process(path: str, ndjson: bool) -> FileResult:
+    result = FileResult(path=path)
+    start = time.perf_counter()
+    try:
+        result.size = os.path.getsize(path)
+        with Tokenizer.from_path(path) as tokenizer:
+            stream = tokenizer.tokenize_stream()
+            result.segments = stream.types.count(_SEGMENT_TAG)
+            if ndjson:
+                lines = list(iter_ndjson(stream))
+                result.messages = len(lines)
+                result.ndjson = ''.join(lines)
+                result.interchanges = sum(1 for index, code in enumerate(stream.types)
+                                          if code == _SEGMENT_TAG and stream.value(index) == "UNB")
+            else:
+                edi_file = Parser(stream, lazy=True).parse()
+                result.interchanges = len(edi_file.interchanges)
+                result.messages = sum(len(interchange.messages) for interchange in edi_file.interchanges)
+    except Exception as error:
+        result.error = f"{type(error).__name__}: {error}"
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _line(result: FileResult, seconds: float) -> str:
+    rate = 1 / seconds if seconds else 0.0
+    return (f"{result.path}: {result.size / 1e6:.2f} MB, {result.interchanges} interchanges, "
+            f"{result.messages} messages, {result.segments} segments in {seconds:.3f}s "
+            f"({result.size / 1e6 * rate:.1f} MB/s, {result.segments * rate:.0f} segments/s)")
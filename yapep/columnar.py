@@ -0,0 +1,138 @@
+from array import array
+from dataclasses import dataclass, field
+from itertools import repeat
+from typing import Any, Iterable
+
+from .ast import File, Interchange, Message
+from .parser import Parser
+
+try:
+    import numpy
+except ImportError:  # optional
+    numpy = None
+
+
+@dataclass(slots=True)
+class SegmentTable:
+    # One row per component of every message body segment, in document
+    # order, so the components of an element are adjacent rows. Indices
+    # count from 0 within the parent node: message within interchange,
+    # segment within message.segments, and so on. tag and value hold
+    # strings shared between equal rows.
+    interchange: Any = field(default_factory=lambda: array('I'))
+    message: Any = field(default_factory=lambda: array('I'))
+    segment: Any = field(default_factory=lambda: array('I'))
+    tag: Any = field(default_factory=list)
+    element: Any = field(default_factory=lambda: array('I'))
+    component: Any = field(default_factory=lambda: array('I'))
+    value: Any = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.value)
+
+    def to_numpy(self) -> "SegmentTable":
+        # Index columns become uint32 arrays sharing memory with the arrays,
+        # tag a fixed-width str array and value an object array.
+        if numpy is None:
+            raise ImportError("to_numpy needs numpy")
+        if isinstance(self.value, numpy.ndarray):
+            return self
+        return SegmentTable(
+            interchange=_uint32(self.interchange),
+            message=_uint32(self.message),
+            segment=_uint32(self.segment),
+            tag=numpy.array(self.tag, dtype=str),
+            element=_uint32(self.element),
+            component=_uint32(self.component),
+            value=numpy.array(self.value, dtype=object),
+        )
+
+
+def _uint32(column: array):
+    if not column:  # frombuffer rejects empty buffers in older releases
+        return numpy.zeros(0, dtype=numpy.uint32)
+    return numpy.frombuffer(column, dtype=numpy.uint32)
+
+
+def segment_table(source: File | Interchange | Message | Parser | Iterable[Interchange | Message],
+                  use_numpy: bool | None = None) -> SegmentTable:
+    # Builds the table from a parsed tree, a Parser (streamed with
+    # iter_messages), or an iterable of interchanges or messages, such as
+    # Parser.iter_interchanges(). Returns NumPy columns when numpy is
+    # installed, unless use_numpy is False.
+    table = SegmentTable()
+    builder = _Builder(table)
+    if isinstance(source, File):
+        for index, interchange in enumerate(source.interchanges):
+            builder.add_messages(index, interchange.messages)
+    elif isinstance(source, Interchange):
+        builder.add_messages(0, source.messages)
+    elif isinstance(source, Message):
+        builder.add_messages(0, [source])
+    elif isinstance(source, Parser):
+        builder.add_parser(source)
+    else:
+        builder.add_nodes(source)
+
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    return table.to_numpy() if use_numpy else table
+
+
+class _Builder:
+    def __init__(self, table: SegmentTable):
+        self.table = table
+        self._strings = {}  # one shared str per distinct tag or value
+
+    def add_messages(self, interchange: int, messages: Iterable[Message]):
+        for index, message in enumerate(messages):
+            self.add_message(interchange, index, message)
+
+    def add_parser(self, parser: Parser):
+        # a new interchange starts whenever the parser's UNB changes
+        interchange = -1
+        index = 0
+        header = object()
+        for message in parser.iter_messages():
+            if parser.interchange_header is not header:
+                header = parser.interchange_header
+                interchange += 1
+                index = 0
+            self.add_message(interchange, index, message)
+            index += 1
+
+    def add_nodes(self, nodes: Iterable[Interchange | Message]):
+        interchange = 0
+        index = 0
+        for node in nodes:
+            if isinstance(node, Interchange):
+                self.add_messages(interchange, node.messages)
+                interchange += 1
+            else:
+                self.add_message(0, index, node)
+                index += 1
+
+    def add_message(self, interchange: int, message: int, node: Message):
+        table = self.table
+        shared = self._strings.setdefault
+        interchanges = table.interchange
+        messages = table.message
+        segments = table.segment
+        tags = table.tag
+        elements = table.element
+        components = table.component
+        values = table.value
+        for position, segment in enumerate(node.segments):
+            tag = shared(segment.tag, segment.tag)
+            count = 0
+            for index, element in enumerate(segment.elements):
+                parts = element.components
+                size = len(parts)
+                elements.extend(repeat(index, size))
+                components.extend(range(size))
+                values.extend([shared(part.value, part.value) for part in parts])
+                count += size
+            interchanges.extend(repeat(interchange, count))
+            messages.extend(repeat(message, count))
+            segments.extend(repeat(position, count))
+            tags.extend(repeat(tag, count))
@@ -0,0 +1,203 @@
+import json
+import mmap
+import os
+import tempfile
+from array import array
+from dataclasses import dataclass
+from os import PathLike
+from typing import Dict, List
+
+from .ast import Message, Segment
+from .boundary import BoundaryScanner
+from .parser import Parser
+from .selective import _header, _segment, _message_type
+from .tokenizer import Tokenizer, Delimiters, detect_delimiters, map_file
+
+_VERSION = 2  # 2: UNB references decoded with the interchange charset
+_SUFFIX = '.yapep-index'
+
+
+@dataclass(slots=True)
+class MessageEntry:
+    number: int  # position in the file, from 0
+    offset: int  # byte offset of the UNH
+    length: int  # bytes up to and including the UNT terminator
+    reference: str | None  # message reference, UNH element 1
+    type: str | None  # message type, UNH element 2
+    interchange: int  # position of the enclosing interchange
+    interchange_reference: str | None  # control reference, UNB element 5
+
+
+def index_path(path: str | PathLike) -> str:
+    return os.fspath(path) + _SUFFIX
+
+
+def build_index(path: str | PathLike, sidecar: str | PathLike | None = None) -> dict:
+    # Scans the file for service segments and writes the sidecar: byte
+    # ranges of every UNB and message with their control references and
+    # message types, the delimiters and charsets, and the size and mtime of
+    # the file to tell when the index is stale. Like parallel parsing, a
+    # message runs from its UNH to the next UNT and anything outside an
+    # interchange is ignored.
+    path = os.fspath(path)
+    stat = os.stat(path)
+    buffer = map_file(path)
+    try:
+        index = _scan(buffer)
+    finally:
+        if isinstance(buffer, mmap.mmap):
+            buffer.close()
+    index.update(version=_VERSION, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+    sidecar = os.fspath(sidecar) if sidecar is not None else index_path(path)
+    fd, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(sidecar)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f, separators=(',', ':'))
+        os.replace(temporary, sidecar)
+    except BaseException:
+        os.remove(temporary)
+        raise
+    return index
+
+
+def open_indexed(path: str | PathLike, sidecar: str | PathLike | None = None,
+                 rebuild: bool = True) -> "IndexedFile":
+    # Loads the sidecar, or builds it when it is missing or stale. With
+    # rebuild=False a missing or stale index raises ValueError instead.
+    path = os.fspath(path)
+    sidecar = os.fspath(sidecar) if sidecar is not None else index_path(path)
+    index = None
+    try:
+        with open(sidecar, encoding='utf-8') as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        pass
+    if index is None or not _fresh(index, path):
+        if not rebuild:
+            raise ValueError(f"missing or stale index for {path}: {sidecar}")
+        index = build_index(path, sidecar)
+    return IndexedFile(path, index)
+
+
+class IndexedFile:
+    # Random access to the messages of a large file: each lookup seeks to
+    # the byte range recorded in the index and parses only that slice.
+    def __init__(self, path: str, index: dict):
+        self.path = path
+        self.delimiters = Delimiters(*index["delimiters"])
+        interchanges = index["interchanges"]
+        messages = index["messages"]
+        self._interchange_offsets = array('Q', interchanges["offset"])
+        self._interchange_lengths = array('Q', interchanges["length"])
+        self._interchange_references: List[str] = interchanges["reference"]
+        self._charsets: List[str] = interchanges["charset"]
+        self._offsets = array('Q', messages["offset"])
+        self._lengths = array('Q', messages["length"])
+        self._interchanges = array('I', messages["interchange"])
+        self._references: List[str] = messages["reference"]
+        self._types: List[str | None] = messages["type"]
+        self._by_reference: Dict[str, List[int]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def entry(self, number: int) -> MessageEntry:
+        number = self._number(number)
+        interchange = self._interchanges[number]
+        return MessageEntry(number, self._offsets[number], self._lengths[number], self._references[number],
+                            self._types[number], interchange, self._interchange_references[interchange])
+
+    def message(self, number: int) -> Message:
+        number = self._number(number)
+        data = self._read(self._offsets[number], self._lengths[number])
+        stream = Tokenizer(data, self._charsets[self._interchanges[number]], self.delimiters).tokenize_stream()
+        return Parser(stream).parse_messages()[0]
+
+    def by_reference(self, reference: str, interchange_reference: str | None = None) -> Message:
+        # The first message with this UNH reference; references repeat across
+        # interchanges, so pass interchange_reference to pick the interchange.
+        for number in self.numbers(reference, interchange_reference):
+            return self.message(number)
+        raise KeyError(reference)
+
+    def numbers(self, reference: str, interchange_reference: str | None = None) -> List[int]:
+        if self._by_reference is None:
+            by_reference = {}
+            for number, value in enumerate(self._references):
+                numbers = by_reference.get(value)
+                if numbers is None:
+                    by_reference[value] = [number]
+                else:
+                    numbers.append(number)
+            self._by_reference = by_reference
+        numbers = self._by_reference.get(reference, [])
+        if interchange_reference is not None:
+            numbers = [number for number in numbers
+                       if self._interchange_references[self._interchanges[number]] == interchange_reference]
+        return numbers
+
+    def interchange_header(self, interchange: int) -> Segment:
+        data = self._read(self._interchange_offsets[interchange], self._interchange_lengths[interchange])
+        return _segment(data, 0, len(data), self.delimiters, self._charsets[interchange])
+
+    def _number(self, number: int) -> int:
+        # negative numbers count from the end, like list indexes
+        if number < 0:
+            number += len(self._offsets)
+        if not 0 <= number < len(self._offsets):
+            raise IndexError(f"message {number} out of range")
+        return number
+
+    def _read(self, offset: int, length: int) -> bytes:
+        # opened per lookup, so no handle outlives the call
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            return f.read(length)
+
+
+def _fresh(index: dict, path: str) -> bool:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return (index.get("version") == _VERSION and index.get("size") == stat.st_size
+            and index.get("mtime_ns") == stat.st_mtime_ns)
+
+
+def _scan(buffer) -> dict:
+    delimiters = detect_delimiters(buffer) or Delimiters()
+    scanner = BoundaryScanner(buffer, delimiters)
+    interchanges = {"offset": [], "length": [], "reference": [], "charset": []}
+    messages = {"offset": [], "length": [], "interchange": [], "reference": [], "type": []}
+    charset = None
+    message = None  # UNH segment and offset of the open message
+    for tag, offset in scanner.boundaries():
+        if message is not None:
+            if tag == "UNT":
+                unh, start = message
+                messages["offset"].append(start)
+                messages["length"].append(scanner.segment_end(offset) - start)
+                messages["interchange"].append(len(interchanges["offset"]) - 1)
+                messages["reference"].append(_value(unh, 0))
+                messages["type"].append(_message_type(unh))
+                message = None
+        elif charset is None:
+            if tag == "UNB":
+                end = scanner.segment_end(offset)
+                header, charset = _header(buffer, offset, end, delimiters, None)
+                interchanges["offset"].append(offset)
+                interchanges["length"].append(end - offset)
+                interchanges["reference"].append(_value(header, 4))
+                interchanges["charset"].append(charset)
+        elif tag == "UNH":
+            message = (_segment(buffer, offset, scanner.segment_end(offset), delimiters, charset), offset)
+        elif tag == "UNZ":
+            charset = None
+    return {"delimiters": ''.join(delimiters), "interchanges": interchanges, "messages": messages}
+
+
+def _value(segment: Segment, element: int) -> str | None:
+    # first component of an element, if the segment has it
+    if len(segment.elements) > element and segment.elements[element].components:
+        return segment.elements[element].components[0].value
+    return None
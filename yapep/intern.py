@@ -0,0 +1,73 @@
+from typing import Dict
+
+from .ast import Component
+
+
+class InternPool:
+    # Hands out one shared str per distinct short value, and with
+    # share_components=True also one shared Component per distinct component
+    # value. Values longer than max_length are passed through untouched, and
+    # once max_size distinct values are held, new ones are no longer
+    # admitted, so the pool stays bounded on feeds full of unique references.
+    # Components are mutable, so sharing them is opt-in: changing a shared
+    # one changes it everywhere it occurs.
+    __slots__ = ('max_size', 'max_length', 'share_components', '_strings', '_components',
+                 'lookups', 'misses', 'skipped')
+
+    def __init__(self, max_size: int = 1 << 16, max_length: int = 32, share_components: bool = False):
+        self.max_size = max_size
+        self.max_length = max_length
+        self.share_components = share_components
+        self._strings: Dict[str, str] = {}
+        self._components: Dict[str, Component] = {}
+        self.lookups = 0  # values that were looked up in the pool
+        self.misses = 0  # lookups that did not find the value
+        self.skipped = 0  # values too long to be looked up
+
+    def string(self, value: str) -> str:
+        if len(value) > self.max_length:
+            self.skipped += 1
+            return value
+        self.lookups += 1
+        shared = self._strings.get(value)
+        if shared is not None:
+            return shared
+        self.misses += 1
+        if len(self._strings) < self.max_size:
+            self._strings[value] = value
+        return value
+
+    def component(self, value: str) -> Component:
+        if not self.share_components:
+            return Component(self.string(value))
+        if len(value) > self.max_length:
+            self.skipped += 1
+            return Component(value)
+        self.lookups += 1
+        shared = self._components.get(value)
+        if shared is not None:
+            return shared
+        self.misses += 1
+        value = self._strings.get(value, value)
+        component = Component(value)
+        if len(self._components) < self.max_size:
+            self._components[value] = component
+        return component
+
+    @property
+    def hit_rate(self) -> float:
+        return (self.lookups - self.misses) / self.lookups if self.lookups else 0.0
+
+    def __len__(self) -> int:
+        return len(self._strings) + len(self._components)
+
+    def clear(self):
+        # drops the pooled values; the counters are kept
+        self._strings.clear()
+        self._components.clear()
+
+    def as_dict(self) -> dict:
+        return {
+            "strings": len(self._strings), "components": len(self._components), "lookups": self.lookups,
+            "misses": self.misses, "skipped": self.skipped, "hit_rate": self.hit_rate,
+        }
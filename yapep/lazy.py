@@ -0,0 +1,83 @@
+from typing import List
+from .tokenizer import TokenType, TokenStream
+from .ast import Segment, Element, Component
+
+_COMPONENT_DATA = TokenType.COMPONENT_DATA.value
+_ELEMENT_SEPARATOR = TokenType.ELEMENT_SEPARATOR.value
+
+
+class LazySegment(Segment):
+    # Keeps the tag and the token range of the segment body; elements are
+    # decoded from the stream the first time they are read.
+    __slots__ = ('_stream', '_start', '_end', '_elements')
+
+    def __init__(self, tag: str, stream: TokenStream, start: int, end: int):
+        self.tag = tag
+        self._stream = stream
+        self._start = start
+        self._end = end
+        self._elements: List[Element] | None = None
+
+    @property
+    def elements(self) -> List[Element]:
+        if self._elements is None:
+            self._elements = self._decode()
+        return self._elements
+
+    @elements.setter
+    def elements(self, elements: List[Element]):
+        self._elements = elements
+
+    def __eq__(self, other):
+        # equal to a Segment with the same content, lazy or not
+        if isinstance(other, Segment):
+            return self.tag == other.tag and self.elements == other.elements
+        return NotImplemented
+
+    def _decode(self) -> List[Element]:
+        types = self._stream.types
+        elements = []
+        first = None  # first component token of the current element
+        for index in range(self._start, self._end):
+            code = types[index]
+            if code == _COMPONENT_DATA:
+                if first is None:
+                    first = index
+            elif code == _ELEMENT_SEPARATOR:
+                if first is not None:
+                    elements.append(LazyElement(self._stream, first, index))
+                    first = None
+        if first is not None and self._end < len(types):  # dropped when unterminated, like Parser
+            elements.append(LazyElement(self._stream, first, self._end))
+        return elements
+
+
+class LazyElement(Element):
+    __slots__ = ('_stream', '_start', '_end', '_components')
+
+    def __init__(self, stream: TokenStream, start: int, end: int):
+        self._stream = stream
+        self._start = start
+        self._end = end
+        self._components: List[Component] | None = None
+
+    @property
+    def components(self) -> List[Component]:
+        if self._components is None:
+            stream = self._stream
+            types = stream.types
+            self._components = [
+                Component(stream.value(index))
+                for index in range(self._start, self._end)
+                if types[index] == _COMPONENT_DATA
+            ]
+        return self._components
+
+    @components.setter
+    def components(self, components: List[Component]):
+        self._components = components
+
+    def __eq__(self, other):
+        if isinstance(other, Element):
+            return list(self.components) == list(other.components)
+        return NotImplemented
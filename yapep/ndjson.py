@@ -0,0 +1,121 @@
+import io
+from itertools import repeat
+from json.encoder import encode_basestring, encode_basestring_ascii
+from typing import IO, Iterable, Iterator, Tuple
+
+from .tokenizer import Token, TokenType, TokenStream
+
+_SEGMENT_TAG = TokenType.SEGMENT_TAG.value
+_COMPONENT_DATA = TokenType.COMPONENT_DATA.value
+_ELEMENT_SEPARATOR = TokenType.ELEMENT_SEPARATOR.value
+_SEGMENT_TERMINATOR = TokenType.SEGMENT_TERMINATOR.value
+
+
+def export_ndjson(source: TokenStream | Iterable[Token], sink: IO, ensure_ascii: bool = False,
+                  buffer_size: int = 1 << 16) -> int:
+    # Writes one JSON object per message to sink and returns the number of
+    # messages. Lines are gathered into writes of about buffer_size
+    # characters; a sink that is not an io.TextIOBase gets UTF-8 bytes.
+    binary = not isinstance(sink, io.TextIOBase)
+    pending = []
+    size = 0
+    count = 0
+    for line in iter_ndjson(source, ensure_ascii):
+        pending.append(line)
+        size += len(line)
+        count += 1
+        if size >= buffer_size:
+            text = ''.join(pending)
+            sink.write(text.encode('utf-8') if binary else text)
+            pending = []
+            size = 0
+    if pending:
+        text = ''.join(pending)
+        sink.write(text.encode('utf-8') if binary else text)
+    return count
+
+
+def iter_ndjson(source: TokenStream | Iterable[Token], ensure_ascii: bool = False) -> Iterator[str]:
+    # Yields a newline-terminated JSON line per UNH...UNT message, shaped
+    #   {"interchange": "<UNB reference>" | null,
+    #    "header": ["UNH", ["1"], ["ORDERS", "D", "96A", "UN"]],
+    #    "segments": [["BGM", ["380"], ["123"]], ...],
+    #    "trailer": ["UNT", ["3"], ["1"]]}
+    # with a segment written as its tag followed by one array of component
+    # values per element. Segments and elements are grouped the same way the
+    # Parser groups them, and the JSON text is built straight from token
+    # values, without AST nodes.
+    encode = encode_basestring_ascii if ensure_ascii else encode_basestring
+    interchange = 'null'
+    header = None  # JSON of the open message's UNH
+    body = []
+    tag = None  # tag of the open segment
+    elements = []
+    components = None  # encoded values of the open element
+    reference = None  # raw value of the fifth UNB element
+    for code, value in _pairs(source):
+        if code == _COMPONENT_DATA:
+            if tag is None:
+                continue
+            if components is None:
+                components = [encode(value)]
+                if tag == "UNB" and len(elements) == 4:
+                    reference = value
+            else:
+                components.append(encode(value))
+        elif code == _ELEMENT_SEPARATOR:
+            if components is not None:
+                elements.append('[' + ','.join(components) + ']')
+                components = None
+        elif code == _SEGMENT_TERMINATOR:
+            if tag is None:
+                continue
+            if components is not None:
+                elements.append('[' + ','.join(components) + ']')
+                components = None
+            segment = _segment(encode(tag), elements)
+            if header is not None:
+                if tag == "UNT":
+                    yield _line(interchange, header, body, segment)
+                    header = None
+                else:
+                    body.append(segment)
+            elif tag == "UNH":
+                header = segment
+                body = []
+            elif tag == "UNB":
+                interchange = 'null' if reference is None else encode(reference)
+                reference = None
+            elif tag == "UNZ":
+                interchange = 'null'
+            tag = None
+            elements = []
+        elif code == _SEGMENT_TAG:
+            if tag is None:
+                tag = value
+    if tag is not None and header is not None and tag == "UNT":
+        # unterminated last segment: its open element is dropped, like Parser
+        yield _line(interchange, header, body, _segment(encode(tag), elements))
+
+
+def _pairs(source: TokenStream | Iterable[Token]) -> Iterator[Tuple[int, str]]:
+    # (type code, value) of every token; a TokenStream is sliced in bulk
+    if not isinstance(source, TokenStream):
+        return ((token.type.value, token.value) for token in source)
+    if source._values:
+        return zip(source.types, map(source.value, range(len(source))))
+    values = map(source.source.__getitem__, map(slice, source.starts, source.ends))
+    if source.encoding is not None:
+        values = map(str, values, repeat(source.encoding))
+    return zip(source.types, values)
+
+
+def _segment(tag: str, elements: list) -> str:
+    if elements:
+        return '[' + tag + ',' + ','.join(elements) + ']'
+    return '[' + tag + ']'
+
+
+def _line(interchange: str, header: str, body: list, trailer: str) -> str:
+    return ('{"interchange":' + interchange + ',"header":' + header + ',"segments":['
+            + ','.join(body) + '],"trailer":' + trailer + '}\n')
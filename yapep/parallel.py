@@ -0,0 +1,150 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from os import PathLike
+from typing import List, Iterator, Iterable, Tuple
+
+from .ast import File, Interchange, Message, Segment
+from .boundary import BoundaryScanner
+from .parser import Parser
+from .tokenizer import Tokenizer, Delimiters, CHARSETS, detect_delimiters, map_file
+
+_Range = Tuple[int, int]
+
+
+@dataclass(slots=True)
+class _Layout:
+    # byte ranges of one interchange, found by the boundary scan
+    header: _Range
+    messages: List[_Range] = field(default_factory=list)
+    trailer: _Range | None = None
+
+
+def parse_parallel(path: str | PathLike, workers: int | None = None, batch_size: int = 1 << 18) -> File:
+    buffer = map_file(path)
+    delimiters = detect_delimiters(buffer)
+    una = None if delimiters is None else Segment(tag="UNA", elements=[])
+    delimiters = delimiters or Delimiters()
+
+    interchanges = []
+    tasks = []
+    owners = []
+    for layout in _scan(buffer, delimiters):
+        header, encoding = _header(buffer, layout.header, delimiters)
+        trailer = None if layout.trailer is None else _segment(buffer, layout.trailer, delimiters, encoding)
+        for batch in _batches(layout.messages, batch_size):
+            tasks.append((os.fspath(path), batch[0], batch[1], delimiters, encoding))
+            owners.append(len(interchanges))
+        interchanges.append(Interchange(header=header, messages=[], trailer=trailer))
+
+    for owner, messages in zip(owners, _map(tasks, workers)):
+        interchanges[owner].messages.extend(messages)
+    return File(una, interchanges)
+
+
+def iter_parallel(path: str | PathLike, workers: int | None = None, batch_size: int = 1 << 18) -> Iterator[Message]:
+    buffer = map_file(path)
+    delimiters = detect_delimiters(buffer) or Delimiters()
+
+    def tasks() -> Iterator[tuple]:
+        for layout in _scan(buffer, delimiters):
+            encoding = _charset(_segment(buffer, layout.header, delimiters, 'latin-1'))
+            for batch in _batches(layout.messages, batch_size):
+                yield os.fspath(path), batch[0], batch[1], delimiters, encoding
+
+    for messages in _map(tasks(), workers):
+        yield from messages
+
+
+def _scan(buffer, delimiters: Delimiters) -> List[_Layout]:
+    # Mirrors Parser.parse: messages count from UNH to the next UNT, and
+    # anything outside an interchange is ignored.
+    scanner = BoundaryScanner(buffer, delimiters)
+    layouts = []
+    current = None
+    message_start = None
+    for tag, offset in scanner.boundaries():
+        if message_start is not None:
+            if tag == "UNT":
+                current.messages.append((message_start, scanner.segment_end(offset)))
+                message_start = None
+        elif current is None:
+            if tag == "UNB":
+                current = _Layout((offset, scanner.segment_end(offset)))
+                layouts.append(current)
+        elif tag == "UNH":
+            message_start = offset
+        elif tag == "UNZ":
+            current.trailer = (offset, scanner.segment_end(offset))
+            current = None
+    return layouts
+
+
+def _batches(messages: List[_Range], batch_size: int) -> Iterator[_Range]:
+    # contiguous runs of messages of about batch_size bytes
+    start = None
+    end = None
+    for message_start, message_end in messages:
+        if start is None:
+            start = message_start
+        elif message_end - start > batch_size:
+            yield start, end
+            start = message_start
+        end = message_end
+    if start is not None:
+        yield start, end
+
+
+def _map(tasks: Iterable[tuple], workers: int | None) -> Iterator[List[Message]]:
+    # Results come back in task order; at most two batches per worker are in
+    # flight so a slow consumer does not pile up parsed messages.
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for task in tasks:
+            yield _parse_batch(task)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        try:
+            for task in tasks:
+                pending.append(pool.submit(_parse_batch, task))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def _parse_batch(task: tuple) -> List[Message]:
+    path, start, end, delimiters, encoding = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    stream = Tokenizer(data, encoding, delimiters).tokenize_stream()
+    return Parser(stream).parse_messages()
+
+
+def _segment(buffer, span: _Range, delimiters: Delimiters, encoding: str) -> Segment:
+    start, end = span
+    tokens = Tokenizer(bytes(buffer[start:end]), encoding, delimiters).tokenize()
+    return next(Parser(tokens).iter_segments())
+
+
+def _header(buffer, span: _Range, delimiters: Delimiters) -> Tuple[Segment, str]:
+    # The syntax identifier is ASCII, so it is read from a Latin-1 decoding
+    # and the UNB decoded again when it names another charset.
+    header = _segment(buffer, span, delimiters, 'latin-1')
+    encoding = _charset(header)
+    if encoding != 'latin-1':
+        header = _segment(buffer, span, delimiters, encoding)
+    return header, encoding
+
+
+def _charset(header: Segment) -> str:
+    if header.elements and header.elements[0].components:
+        return CHARSETS.get(header.elements[0].components[0].value, 'latin-1')
+    return 'latin-1'
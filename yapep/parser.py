@@ -1,15 +1,111 @@
-from typing import List
-from .tokenizer import Token, TokenType
-from .ast import File, Interchange, Message, Segment, Element, Component
+import re
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, List, Iterable, Iterator, Tuple
+from .tokenizer import Token, TokenType, TokenStream
+from .ast import Node, File, Interchange, Message, Segment, Element, FlatElement, Component
+from .lazy import LazySegment
+from .intern import InternPool
+from .stats import ParseStats
+
+_SEGMENT_TAG = TokenType.SEGMENT_TAG.value
+_COMPONENT_DATA = TokenType.COMPONENT_DATA.value
+_ELEMENT_SEPARATOR = TokenType.ELEMENT_SEPARATOR.value
+_SEGMENT_TERMINATOR = TokenType.SEGMENT_TERMINATOR.value
+_TAG_CODES = re.compile(re.escape(bytes([_SEGMENT_TAG])))
+_ENVELOPE_TAGS = frozenset(("UNB", "UNH", "UNT", "UNZ"))
+
+
+@dataclass(slots=True)
+class Diagnostic:
+    # a range of tokens the parser skipped, or a missing segment (start == end)
+    reason: str
+    start: int  # index of the first token concerned
+    end: int  # index just past the last one
+    offset: int | None = None  # position of start in the source, for a TokenStream
+
+
+def _flat_element(components: List[Component]) -> Element:
+    if len(components) == 1:
+        return FlatElement(components[0])
+    return Element(components)
+
+
+def _count_messages(stats: ParseStats, messages: List[Message]):
+    for message in messages:
+        size = len(message.segments) + 2
+        stats.segments += size
+        stats.add_message(size)
+
+
+def _add_position(index: dict, tag: str, position: int):
+    positions = index.get(tag)
+    if positions is None:
+        index[tag] = [position]
+    else:
+        positions.append(position)
 
 
 class Parser:
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: List[Token] | TokenStream | Iterable[Token], lazy: bool = False,
+                 flatten: bool = False, stats: ParseStats | None = None, pool: InternPool | None = None,
+                 recover: bool = False):
         self.tokens = tokens
         self.index = 0
+        self._stream = tokens if isinstance(tokens, TokenStream) else None
+        if lazy and self._stream is None:
+            raise TypeError("lazy parsing needs a TokenStream")
+        self.lazy = lazy
+        self.flatten = flatten
+        self._element = _flat_element if flatten else Element
+        # With stats, parsing is timed as the "parse" phase and the segments
+        # and messages built are counted. For iter_messages() and
+        # iter_interchanges() that time includes pulling the tokens.
+        self.stats = stats
+        # With pool, equal tags and component values share one str, or equal
+        # component values one Component with share_components (see InternPool).
+        self.pool = pool
+        self._component = Component if pool is None else pool.component
+        self._tag = None if pool is None else pool.string
+        # With recover, parse() and parse_messages() do not fail on malformed
+        # or truncated input: they jump to the next UNB, UNH or segment and
+        # record a Diagnostic for each skipped range or missing UNT/UNZ.
+        self.recover = recover
+        self.diagnostics: List[Diagnostic] = []
+        # set while streaming with iter_messages()/iter_interchanges()/feed()
+        self.una: Segment | None = None
+        self.interchange_header: Segment | None = None
+        self._segment_parser: Parser | None = None  # builds segments for _segments_in
+        self._start_nodes(keep_messages=False)
 
     def parse(self) -> File:
-        una = self._parse_segment()
+        stats = self.stats
+        if stats is None:
+            return self._parse()
+        with stats.phase("parse"):
+            edi_file = self._parse()
+        stats.segments += edi_file.una is not None
+        for interchange in edi_file.interchanges:
+            stats.segments += (interchange.header is not None) + (interchange.trailer is not None)
+            _count_messages(stats, interchange.messages)
+        return edi_file
+
+    def parse_messages(self) -> List[Message]:
+        # For token sequences holding bare UNH...UNT messages
+        stats = self.stats
+        if stats is None:
+            return self._parse_messages()
+        with stats.phase("parse"):
+            messages = self._parse_messages()
+        _count_messages(stats, messages)
+        return messages
+
+    def _parse(self) -> File:
+        una = None
+        if self.tokens and self.tokens[0].type == TokenType.SEGMENT_TAG and self._value_at(0) == "UNA":
+            una = self._parse_segment()
+        if self.recover:
+            return File(una, self._recover_interchanges())
 
         interchanges = []
         while self.index < len(self.tokens):
@@ -19,13 +115,23 @@ class Parser:
 
         return File(una, interchanges)
 
+    def _parse_messages(self) -> List[Message]:
+        if self.recover:
+            return self._recover_messages()
+        messages = []
+        while self.index < len(self.tokens):
+            message = self._parse_message()
+            if message:
+                messages.append(message)
+        return messages
+
     def _parse_interchange(self) -> Interchange | None:
-        if self.tokens[self.index].value != "UNB":
+        if self._value_at(self.index) != "UNB":
             self.index += 1
             return None
         header = self._parse_segment()
         messages = []
-        while self.index < len(self.tokens) and self.tokens[self.index].value != "UNZ":
+        while self.index < len(self.tokens) and self._value_at(self.index) != "UNZ":
             message = self._parse_message()
             if message:
                 messages.append(message)
@@ -35,49 +141,363 @@ class Parser:
 
     def _parse_message(self) -> Message | None:
         # Parse the UNH segment (start of the message)
-        if self.tokens[self.index].value != "UNH":
+        if self._value_at(self.index) != "UNH":
             self.index += 1
             return None
         header = self._parse_segment()
         segments = []
+        index = {}  # tag -> positions, see Message.find
 
         # Parse all segments inside the message
-        while self.index < len(self.tokens) and self.tokens[self.index].value != "UNT":
+        while self.index < len(self.tokens) and self._value_at(self.index) != "UNT":
             segment = self._parse_segment()
             if segment:
+                _add_position(index, segment.tag, len(segments))
                 segments.append(segment)
         # Parse the UNT segment (end of the message)
         trailer = self._parse_segment()
-        return Message(header=header, segments=segments, trailer=trailer)
+        message = Message(header=header, segments=segments, trailer=trailer)
+        message._index = index
+        return message
+
+    def _recover_interchanges(self) -> List[Interchange]:
+        envelope = self._index_boundaries()
+        interchanges = []
+        length = len(self.tokens)
+        while self.index < length:
+            if envelope.get(self.index) != "UNB":
+                self._skip_to(("UNB",), "expected UNB")
+                continue
+            header = self._parse_segment()
+            messages = []
+            trailer = None
+            while True:
+                tag = envelope.get(self.index)
+                if tag == "UNZ":
+                    trailer = self._parse_segment()
+                    break
+                if tag == "UNB" or self.index >= length:
+                    self._diagnose("missing UNZ", self.index, self.index)
+                    break
+                if tag == "UNH":
+                    messages.append(self._recover_message())
+                else:
+                    self._skip_to(("UNH", "UNZ", "UNB"), "expected UNH or UNZ")
+            interchanges.append(Interchange(header=header, messages=messages, trailer=trailer))
+        return interchanges
+
+    def _recover_messages(self) -> List[Message]:
+        envelope = self._index_boundaries()
+        messages = []
+        while self.index < len(self.tokens):
+            if envelope.get(self.index) == "UNH":
+                messages.append(self._recover_message())
+            else:
+                self._skip_to(("UNH",), "expected UNH")
+        return messages
+
+    def _recover_message(self) -> Message:
+        envelope = self._envelope
+        types = self._stream.types if self._stream is not None else None
+        tokens = self.tokens
+        length = len(tokens)
+        header = self._parse_segment()
+        segments = []
+        index = {}
+        trailer = None
+        while True:
+            position = self.index
+            tag = envelope.get(position)
+            if tag == "UNT":
+                trailer = self._parse_segment()
+                break
+            if tag is not None or position >= length:
+                self._diagnose("missing UNT", position, position)
+                break
+            if (types[position] != _SEGMENT_TAG if types is not None
+                    else tokens[position].type != TokenType.SEGMENT_TAG):
+                # stray tokens, e.g. an empty segment; go to the next tag
+                k = bisect_right(self._tag_positions, position)
+                end = self._tag_positions[k] if k < len(self._tag_positions) else length
+                self._diagnose("expected a segment tag", position, end)
+                self.index = end
+                continue
+            segment = self._parse_segment()
+            _add_position(index, segment.tag, len(segments))
+            segments.append(segment)
+        message = Message(header=header, segments=segments, trailer=trailer)
+        message._index = index
+        return message
+
+    def _index_boundaries(self) -> Dict[int, str]:
+        # Positions of all segment tags, and of the envelope tags among them
+        # by position, so recovery jumps with a bisect instead of stepping
+        # through tokens.
+        if self._stream is not None:
+            positions = [match.start() for match in _TAG_CODES.finditer(self._stream.types.tobytes())]
+        else:
+            positions = [i for i, token in enumerate(self.tokens) if token.type == TokenType.SEGMENT_TAG]
+        envelope = {}
+        for position in positions:
+            tag = self._value_at(position)
+            if tag in _ENVELOPE_TAGS:
+                envelope[position] = tag
+        self._tag_positions = positions
+        self._envelope = envelope
+        self._stops = list(envelope)
+        return envelope
+
+    def _skip_to(self, tags: Tuple[str, ...], reason: str):
+        # jump to the next envelope segment with one of tags, or to the end
+        start = self.index
+        stops = self._stops
+        envelope = self._envelope
+        end = len(self.tokens)
+        for k in range(bisect_right(stops, start), len(stops)):
+            if envelope[stops[k]] in tags:
+                end = stops[k]
+                break
+        self._diagnose(reason, start, end)
+        self.index = end
+
+    def _diagnose(self, reason: str, start: int, end: int):
+        offset = None
+        if self._stream is not None:
+            starts = self._stream.starts
+            offset = starts[start] if start < len(starts) else (self._stream.ends[-1] if starts else 0)
+        self.diagnostics.append(Diagnostic(reason, start, end, offset))
+
+    def _value_at(self, index: int) -> str:
+        if self._stream is not None:
+            return self._stream.value(index)
+        return self.tokens[index].value
 
     def _parse_segment(self) -> Segment | None:
+        if self._stream is not None:
+            return self._parse_stream_segment()
         if self.tokens[self.index].type != TokenType.SEGMENT_TAG:
             self.index += 1
             return None
 
         tag = self.tokens[self.index].value
+        if self._tag is not None:
+            tag = self._tag(tag)
         self.index += 1
         elements = []
         current_components = []
+        make_component = self._component
 
         while self.index < len(self.tokens):
             token = self.tokens[self.index]
             if token.type == TokenType.ELEMENT_SEPARATOR:
                 if current_components:
-                    elements.append(Element(current_components))
+                    elements.append(self._element(current_components))
                     current_components = []
                 self.index += 1
             elif token.type == TokenType.COMPONENT_DATA:
-                current_components.append(Component(token.value))
+                current_components.append(make_component(token.value))
                 self.index += 1
             elif token.type == TokenType.COMPONENT_SEPARATOR:
                 self.index += 1  # just skip separator
             elif token.type == TokenType.SEGMENT_TERMINATOR:
                 if current_components:
-                    elements.append(Element(current_components))
+                    elements.append(self._element(current_components))
                 self.index += 1
                 break
             else:
                 self.index += 1
 
         return Segment(tag=tag, elements=elements)
+
+    def _parse_stream_segment(self) -> Segment | None:
+        # Same as _parse_segment, reading type codes and spans straight from
+        # the TokenStream arrays so no Token objects are created.
+        stream = self._stream
+        types = stream.types
+        index = self.index
+        if types[index] != _SEGMENT_TAG:
+            self.index += 1
+            return None
+
+        if self.lazy:
+            try:
+                end = types.index(_SEGMENT_TERMINATOR, index + 1)
+            except ValueError:
+                end = len(types)
+            self.index = end + 1
+            tag = stream.value(index)
+            if self._tag is not None:
+                tag = self._tag(tag)
+            return LazySegment(tag, stream, index + 1, end)
+
+        make_element = self._element
+        make_component = self._component
+        source = stream.source
+        starts = stream.starts
+        ends = stream.ends
+        values = stream._values
+        encoding = stream.encoding
+        tag = stream.value(index)
+        if self._tag is not None:
+            tag = self._tag(tag)
+        index += 1
+        elements = []
+        current_components = []
+        length = len(types)
+        while index < length:
+            code = types[index]
+            if code == _COMPONENT_DATA:
+                if index in values:
+                    current_components.append(make_component(values[index]))
+                elif encoding is None:
+                    current_components.append(make_component(source[starts[index]:ends[index]]))
+                else:
+                    current_components.append(make_component(str(source[starts[index]:ends[index]], encoding)))
+            elif code == _ELEMENT_SEPARATOR:
+                if current_components:
+                    elements.append(make_element(current_components))
+                    current_components = []
+            elif code == _SEGMENT_TERMINATOR:
+                if current_components:
+                    elements.append(make_element(current_components))
+                index += 1
+                break
+            index += 1
+
+        self.index = index
+        return Segment(tag=tag, elements=elements)
+
+    def iter_segments(self) -> Iterator[Segment]:
+        # Groups the token iterator one segment at a time, so only the tokens
+        # of the segment being built are held in memory.
+        pending: List[Token] = []
+        for token in self.tokens:
+            pending.append(token)
+            if token.type == TokenType.SEGMENT_TERMINATOR:
+                yield from self._segments_in(pending)
+                pending = []
+        yield from self._segments_in(pending)
+
+    def iter_messages(self) -> Iterator[Message]:
+        nodes = self._iter_nodes(keep_messages=False)
+        if self.stats is not None:
+            nodes = self.stats.timed("parse", nodes)
+        for node in nodes:
+            if isinstance(node, Message):
+                yield node
+
+    def iter_interchanges(self) -> Iterator[Interchange]:
+        nodes = self._iter_nodes(keep_messages=True)
+        if self.stats is not None:
+            nodes = self.stats.timed("parse", nodes)
+        for node in nodes:
+            if isinstance(node, Interchange):
+                yield node
+
+    def feed(self, tokens: Iterable[Token]) -> List[Message]:
+        # Push-style iter_messages: tokens may stop anywhere, even inside a
+        # segment. Returns the messages completed by these tokens.
+        if self.stats is None:
+            return self._feed(tokens, self._add_segment)
+        with self.stats.phase("parse"):
+            return self._feed(tokens, self._count_segment)
+
+    def close(self) -> List[Message]:
+        # messages completed by an unterminated last segment
+        if self.stats is None:
+            return self._close(self._add_segment)
+        with self.stats.phase("parse"):
+            return self._close(self._count_segment)
+
+    def _feed(self, tokens: Iterable[Token], add_segment) -> List[Message]:
+        messages = []
+        pending = self._pending
+        for token in tokens:
+            pending.append(token)
+            if token.type == TokenType.SEGMENT_TERMINATOR:
+                for segment in self._segments_in(pending):
+                    node = add_segment(segment)
+                    if isinstance(node, Message):
+                        messages.append(node)
+                pending.clear()
+        return messages
+
+    def _close(self, add_segment) -> List[Message]:
+        messages = []
+        for segment in self._segments_in(self._pending):
+            node = add_segment(segment)
+            if isinstance(node, Message):
+                messages.append(node)
+        self._pending = []
+        return messages
+
+    def _iter_nodes(self, keep_messages: bool) -> Iterator[Node]:
+        self._start_nodes(keep_messages)
+        add_segment = self._add_segment if self.stats is None else self._count_segment
+        for segment in self.iter_segments():
+            node = add_segment(segment)
+            if node is not None:
+                yield node
+
+    def _start_nodes(self, keep_messages: bool):
+        # state for assembling messages and interchanges segment by segment
+        self._keep_messages = keep_messages
+        self._open: Segment | None = None  # UNH of the open message
+        self._segments: List[Segment] = []
+        self._tags: dict = {}
+        self._messages: List[Message] = []
+        self._pending: List[Token] = []  # tokens of an unfinished segment (feed)
+
+    def _add_segment(self, segment: Segment) -> Node | None:
+        # Returns the Message closed by a UNT or the Interchange closed by a
+        # UNZ, if any.
+        tag = segment.tag
+        if self._open is not None:
+            if tag == "UNT":
+                message = Message(header=self._open, segments=self._segments, trailer=segment)
+                message._index = self._tags
+                self._open = None
+                if self._keep_messages:
+                    self._messages.append(message)
+                return message
+            _add_position(self._tags, tag, len(self._segments))
+            self._segments.append(segment)
+        elif tag == "UNH":
+            self._open = segment
+            self._segments = []
+            self._tags = {}
+        elif tag == "UNB":
+            self.interchange_header = segment
+            self._messages = []
+        elif tag == "UNZ":
+            header = self.interchange_header
+            self.interchange_header = None
+            messages = self._messages
+            self._messages = []
+            if header is not None:
+                return Interchange(header=header, messages=messages, trailer=segment)
+        elif tag == "UNA":
+            self.una = segment
+        return None
+
+    def _count_segment(self, segment: Segment) -> Node | None:
+        # _add_segment, counting into self.stats
+        stats = self.stats
+        stats.segments += 1
+        node = self._add_segment(segment)
+        if isinstance(node, Message):
+            stats.add_message(len(node.segments) + 2)
+        return node
+
+    def _segments_in(self, tokens: List[Token]) -> Iterator[Segment]:
+        # One helper parser is pointed at each batch of tokens in turn
+        # instead of building a Parser per segment.
+        parser = self._segment_parser
+        if parser is None:
+            parser = self._segment_parser = Parser([], flatten=self.flatten, pool=self.pool)
+        parser.tokens = tokens
+        parser.index = 0
+        while parser.index < len(tokens):
+            segment = parser._parse_segment()
+            if segment:
+                yield segment
@@ -0,0 +1,165 @@
+import re
+from functools import lru_cache
+from typing import Callable, Iterable, List
+
+from .ast import Node, File, Interchange, Message, Segment
+from .tokenizer import TokenType, TokenStream
+
+_SEGMENT_TAG = TokenType.SEGMENT_TAG.value
+_COMPONENT_DATA = TokenType.COMPONENT_DATA.value
+_ELEMENT_SEPARATOR = TokenType.ELEMENT_SEPARATOR.value
+_SEGMENT_TERMINATOR = TokenType.SEGMENT_TERMINATOR.value
+
+# TAG[QUALIFIER]/element/component, element and component counted from 0;
+# the qualifier and the component (default 0) are optional.
+_EXPRESSION = re.compile(r'([A-Za-z0-9]+)(?:\[([^\[\]]*)\])?/(\d+)(?:/(\d+))?')
+_SERVICE_TAGS = frozenset(("UNA", "UNB", "UNZ", "UNH", "UNT"))
+
+
+class FieldPath:
+    # A compiled path expression. get(segment) returns the addressed value
+    # of one segment, or None when the qualifier does not match or the
+    # element or component is missing.
+    __slots__ = ('expression', 'tag', 'qualifier', 'element', 'component', 'get')
+
+    def __init__(self, expression: str, tag: str, qualifier: str | None, element: int, component: int):
+        self.expression = expression
+        self.tag = tag
+        self.qualifier = qualifier
+        self.element = element
+        self.component = component
+        self.get: Callable[[Segment], str | None] = _getter(qualifier, element, component)
+
+    def extract(self, node: Node | TokenStream) -> List[str]:
+        if isinstance(node, TokenStream):
+            return list(self._scan(node))
+        get = self.get
+        values = []
+        for segment in _segments(node, self.tag):
+            value = get(segment)
+            if value is not None:
+                values.append(value)
+        return values
+
+    def extract_first(self, node: Node | TokenStream) -> str | None:
+        if isinstance(node, TokenStream):
+            return next(self._scan(node), None)
+        get = self.get
+        for segment in _segments(node, self.tag):
+            value = get(segment)
+            if value is not None:
+                return value
+        return None
+
+    def _scan(self, stream: TokenStream) -> Iterable[str]:
+        # Walks the type codes of matching segments and decodes only the
+        # qualifier and the addressed component. Elements are counted the way
+        # the Parser builds them.
+        types = stream.types
+        length = len(types)
+        tag = self.tag
+        qualifier = self.qualifier
+        wanted_element = self.element
+        wanted_component = self.component
+        index = 0
+        while True:
+            try:
+                index = types.index(_SEGMENT_TAG, index)
+            except ValueError:
+                return
+            index += 1
+            if stream.value(index - 1) != tag:
+                continue
+            element = -1
+            component = 0
+            open_element = False  # current element has component data
+            found = None
+            while index < length:
+                code = types[index]
+                if code == _COMPONENT_DATA:
+                    if not open_element:
+                        open_element = True
+                        element += 1
+                        component = 0
+                    if element == 0 and component == 0 and qualifier is not None \
+                            and stream.value(index) != qualifier:
+                        break
+                    if element == wanted_element and component == wanted_component:
+                        found = index
+                    component += 1
+                elif code == _ELEMENT_SEPARATOR:
+                    open_element = False
+                elif code == _SEGMENT_TERMINATOR:
+                    if found is not None:
+                        yield stream.value(found)
+                    break
+                index += 1
+            else:
+                # end of data: the parser keeps only completed elements
+                if found is not None and (element > wanted_element or not open_element):
+                    yield stream.value(found)
+
+
+@lru_cache(maxsize=1024)
+def compile_path(expression: str) -> FieldPath:
+    match = _EXPRESSION.fullmatch(expression.strip())
+    if match is None:
+        raise ValueError(f"invalid path expression: {expression!r}")
+    tag, qualifier, element, component = match.groups()
+    return FieldPath(expression, tag, qualifier, int(element), int(component or 0))
+
+
+def extract(node: Node | TokenStream, expression: str) -> List[str]:
+    return compile_path(expression).extract(node)
+
+
+def extract_first(node: Node | TokenStream, expression: str) -> str | None:
+    return compile_path(expression).extract_first(node)
+
+
+def _getter(qualifier: str | None, element: int, component: int) -> Callable[[Segment], str | None]:
+    def get(segment: Segment) -> str | None:
+        elements = segment.elements
+        if qualifier is not None:
+            if not elements:
+                return None
+            components = elements[0].components
+            if not components or components[0].value != qualifier:
+                return None
+        if element < len(elements):
+            components = elements[element].components
+            if component < len(components):
+                return components[component].value
+        return None
+    return get
+
+
+def _segments(node: Node, tag: str) -> Iterable[Segment]:
+    # Segments tagged tag under node, in file order. Body segments are read
+    # through the message and file indexes.
+    if isinstance(node, Segment):
+        if node.tag == tag:
+            yield node
+    elif isinstance(node, Message):
+        if node.header is not None and node.header.tag == tag:
+            yield node.header
+        yield from node.segments_by_tag(tag)
+        if node.trailer is not None and node.trailer.tag == tag:
+            yield node.trailer
+    elif isinstance(node, Interchange):
+        if node.header is not None and node.header.tag == tag:
+            yield node.header
+        for message in node.messages:
+            yield from _segments(message, tag)
+        if node.trailer is not None and node.trailer.tag == tag:
+            yield node.trailer
+    elif isinstance(node, File):
+        if tag not in _SERVICE_TAGS:
+            yield from node.segments_by_tag(tag)
+            return
+        if node.una is not None and node.una.tag == tag:
+            yield node.una
+        for interchange in node.interchanges:
+            yield from _segments(interchange, tag)
+    else:
+        raise TypeError(f"cannot extract fields from {type(node).__name__}")
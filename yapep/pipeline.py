@@ -0,0 +1,96 @@
+import queue
+import threading
+from typing import IO, Iterable, Iterator, List
+
+from .ast import Visitor
+from .parser import Parser
+from .tokenizer import StreamTokenizer, Token, _text_chunks
+
+_DONE = object()  # end of a stage's output
+
+
+def run_pipeline(source: IO | Iterable, visitor: Visitor, chunk_size: int = 1 << 16,
+                 encoding: str = 'latin-1', maxsize: int = 16) -> int:
+    # Tokenizing and parsing run in their own threads, connected to the
+    # visitor (run in the calling thread) by queues of at most maxsize
+    # items, so a slow stage holds back the ones before it. Each message is
+    # visited with message.accept(visitor) as soon as its UNT is parsed.
+    # The first error raised by any stage stops the others and is re-raised
+    # here. Returns the number of messages visited.
+    token_batches: queue.Queue = queue.Queue(maxsize)
+    messages: queue.Queue = queue.Queue(maxsize)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def tokenize():
+        tokenizer = StreamTokenizer()
+        for chunk in _text_chunks(source, chunk_size, encoding):
+            if not _put(token_batches, tokenizer.feed(chunk), stop):
+                return
+        if _put(token_batches, tokenizer.close(), stop):
+            _put(token_batches, _DONE, stop)
+
+    def parse():
+        for message in Parser(_tokens(token_batches, stop)).iter_messages():
+            if not _put(messages, message, stop):
+                return
+        _put(messages, _DONE, stop)
+
+    threads = [
+        threading.Thread(target=_guard, args=(tokenize, stop, errors), name="yapep-tokenize", daemon=True),
+        threading.Thread(target=_guard, args=(parse, stop, errors), name="yapep-parse", daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    count = 0
+    try:
+        for message in _items(messages, stop):
+            message.accept(visitor)
+            count += 1
+    except BaseException:
+        stop.set()
+        raise
+    finally:
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return count
+
+
+def _guard(stage, stop: threading.Event, errors: List[BaseException]):
+    try:
+        stage()
+    except BaseException as error:
+        errors.append(error)
+        stop.set()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    # blocks while q is full, giving up once another stage has stopped
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.05)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _items(q: queue.Queue, stop: threading.Event) -> Iterator:
+    while True:
+        try:
+            item = q.get(timeout=0.05)
+        except queue.Empty:
+            if stop.is_set():
+                return
+            continue
+        if item is _DONE:
+            return
+        yield item
+
+
+def _tokens(q: queue.Queue, stop: threading.Event) -> Iterator[Token]:
+    for batch in _items(q, stop):
+        yield from batch
@@ -0,0 +1,137 @@
+import mmap
+import re
+from typing import Callable, Collection, Iterator, List, Tuple
+
+from .ast import File, Interchange, Message, Segment, Element, Component
+from .boundary import BoundaryScanner
+from .parallel import _charset
+from .parser import Parser
+from .tokenizer import Tokenizer, Delimiters, detect_delimiters
+
+_WHITESPACE = re.compile(r'\s')
+
+# called with the UNH segment and the enclosing UNB segment
+Predicate = Callable[[Segment, Segment], bool]
+
+
+def parse_selected(data: str | bytes | mmap.mmap | memoryview, types: Collection[str] | None = None,
+                   predicate: Predicate | None = None, encoding: str | None = None,
+                   delimiters: Delimiters | None = None) -> File:
+    # Like Parser(Tokenizer(data).tokenize_stream()).parse(), keeping only
+    # the messages whose type (UNH element 2) is in types and for which
+    # predicate returns true. Interchanges keep their UNB and UNZ even when
+    # none of their messages is selected.
+    una = Segment(tag="UNA", elements=[]) if detect_delimiters(data) is not None else None
+    interchanges = []
+    current = None
+    for kind, item in _select(data, types, predicate, encoding, delimiters):
+        if kind == "UNB":
+            current = Interchange(header=item, messages=[], trailer=None)
+            interchanges.append(current)
+        elif kind == "UNZ":
+            current.trailer = item
+        else:
+            current.messages.extend(item)
+    return File(una, interchanges)
+
+
+def iter_selected(data: str | bytes | mmap.mmap | memoryview, types: Collection[str] | None = None,
+                  predicate: Predicate | None = None, encoding: str | None = None,
+                  delimiters: Delimiters | None = None) -> Iterator[Message]:
+    for kind, item in _select(data, types, predicate, encoding, delimiters):
+        if kind == "messages":
+            yield from item
+
+
+def _select(data, types: Collection[str] | None, predicate: Predicate | None, encoding: str | None,
+            delimiters: Delimiters | None) -> Iterator[Tuple[str, object]]:
+    # Yields ("UNB", header), ("messages", [Message, ...]) and ("UNZ",
+    # trailer or None). Only the service segments are found by the boundary
+    # scan; a rejected message costs one UNH parse and a jump to its UNT.
+    # Runs of adjacent selected messages are tokenized and parsed together.
+    # Like parallel parsing, a message runs from its UNH to the next UNT and
+    # anything outside an interchange is ignored.
+    if types is not None:
+        types = frozenset(types)
+    delimiters = delimiters or detect_delimiters(data) or Delimiters()
+    scanner = BoundaryScanner(data, delimiters)
+    header = None
+    charset = None
+    run = None  # (start, end) of the selected messages not parsed yet
+    message_start = None
+    selected = False
+    for tag, offset in scanner.boundaries():
+        if message_start is not None:
+            if tag == "UNT":
+                if selected:
+                    run = (message_start if run is None else run[0], scanner.segment_end(offset))
+                message_start = None
+        elif header is None:
+            if tag == "UNB":
+                header, charset = _header(data, offset, scanner.segment_end(offset), delimiters, encoding)
+                yield "UNB", header
+        elif tag == "UNH":
+            unh = _segment(data, offset, scanner.segment_end(offset), delimiters, charset)
+            selected = ((types is None or _message_type(unh) in types)
+                        and (predicate is None or predicate(unh, header)))
+            if not selected and run is not None:
+                yield "messages", _parse(data, run, delimiters, charset)
+                run = None
+            message_start = offset
+        elif tag == "UNZ":
+            if run is not None:
+                yield "messages", _parse(data, run, delimiters, charset)
+                run = None
+            yield "UNZ", _segment(data, offset, scanner.segment_end(offset), delimiters, charset)
+            header = None
+    if run is not None:
+        yield "messages", _parse(data, run, delimiters, charset)
+    if header is not None:
+        yield "UNZ", None
+
+
+def _message_type(unh: Segment) -> str | None:
+    # UNH element 2, component 1, e.g. INVOIC
+    if len(unh.elements) > 1 and unh.elements[1].components:
+        return unh.elements[1].components[0].value
+    return None
+
+
+def _header(data, start: int, end: int, delimiters: Delimiters,
+            encoding: str | None) -> Tuple[Segment, str]:
+    # The UNB and the charset of its interchange: encoding, or the one named
+    # by the syntax identifier. The identifier is ASCII, so it can be read
+    # from a Latin-1 decoding before the segment is decoded with its charset.
+    if encoding is None:
+        encoding = _charset(_segment(data, start, end, delimiters, 'latin-1'))
+    return _segment(data, start, end, delimiters, encoding), encoding
+
+
+def _tokenizer(data, start: int, end: int, delimiters: Delimiters, encoding: str) -> Tokenizer:
+    # encoding only applies to bytes
+    piece = data[start:end]
+    if isinstance(piece, str):
+        return Tokenizer(piece, None, delimiters)
+    return Tokenizer(piece if isinstance(piece, bytes) else bytes(piece), encoding, delimiters)
+
+
+def _segment(data, start: int, end: int, delimiters: Delimiters, encoding: str) -> Segment:
+    # Service segments without release characters or whitespace are split
+    # directly, which is what the tokenizer and parser would make of them.
+    text = data[start:end]
+    if not isinstance(text, str):
+        text = str(text, encoding)
+    if text.endswith(delimiters.terminator):
+        text = text[:-1]
+    if delimiters.release not in text and not _WHITESPACE.search(text):
+        tag, *elements = text.split(delimiters.element)
+        component = delimiters.component
+        return Segment(tag, [Element([Component(value) for value in element.split(component)])
+                             for element in elements])
+    tokens = _tokenizer(data, start, end, delimiters, encoding).tokenize()
+    return next(Parser(tokens).iter_segments())
+
+
+def _parse(data, run: Tuple[int, int], delimiters: Delimiters, encoding: str) -> List[Message]:
+    stream = _tokenizer(data, *run, delimiters, encoding).tokenize_stream()
+    return Parser(stream).parse_messages()
@@ -0,0 +1,236 @@
+import mmap
+import struct
+from array import array
+from os import PathLike
+from typing import Dict, List
+
+from .ast import File, Interchange, Message, Segment, Element, Component
+
+# A snapshot is a header, then uint32 arrays in native byte order, then the
+# UTF-8 string table:
+#   string_offsets      strings + 1   start of each string in the table
+#   segment_tags        segments      string of each tag
+#   segment_elements    segments + 1  first element of each segment
+#   element_components  elements + 1  first component of each element
+#   component_values    components    string of each value
+#   messages            4 * messages  UNH, first and end body segment, UNT
+#   interchanges        4 * interchanges  UNB, first and end message, UNZ
+# Segments are numbered in document order, so the body of a message is a
+# range. _NONE stands for a missing UNA or trailer.
+_MAGIC = b'YAPEPSNP'
+_VERSION = 1
+_ORDER = 0x01020304  # reads back as 0x04030201 on a machine of the other byte order
+_NONE = 0xFFFFFFFF
+_HEADER = struct.Struct('=8s11I')
+
+
+def dump(edi_file: File, path: str | PathLike):
+    strings: Dict[str, int] = {}
+    tags = array('I')
+    segment_elements = array('I', [0])
+    element_components = array('I', [0])
+    values = array('I')
+    messages = array('I')
+    interchanges = array('I')
+
+    def string(value: str) -> int:
+        number = strings.get(value)
+        if number is None:
+            number = strings[value] = len(strings)
+        return number
+
+    def add(segment: Segment | None) -> int:
+        if segment is None:
+            return _NONE
+        tags.append(string(segment.tag))
+        for element in segment.elements:
+            values.extend([string(component.value) for component in element.components])
+            element_components.append(len(values))
+        segment_elements.append(len(element_components) - 1)
+        return len(tags) - 1
+
+    una = add(edi_file.una)
+    for interchange in edi_file.interchanges:
+        header = add(interchange.header)
+        first_message = len(messages) // 4
+        for message in interchange.messages:
+            message_header = add(message.header)
+            first = len(tags)
+            for segment in message.segments:
+                add(segment)
+            messages.extend((message_header, first, len(tags), add(message.trailer)))
+        interchanges.extend((header, first_message, len(messages) // 4, add(interchange.trailer)))
+
+    encoded = [value.encode('utf-8', 'surrogatepass') for value in strings]
+    offsets = array('I', [0])
+    position = 0
+    for value in encoded:
+        position += len(value)
+        offsets.append(position)
+    blob = b''.join(encoded)
+
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, _ORDER, len(strings), len(blob), len(tags),
+                             len(element_components) - 1, len(values), len(messages) // 4,
+                             len(interchanges) // 4, una, 0))
+        for words in (offsets, tags, segment_elements, element_components, values, messages, interchanges):
+            words.tofile(f)
+        f.write(blob)
+
+
+def load(path: str | PathLike) -> File:
+    # Maps the snapshot instead of reading it. Interchanges and their UNB
+    # and UNZ are built right away; the segments of a message, its UNH and
+    # its UNT are only built when they are first read. Either way only the
+    # strings a node uses are decoded, so a load costs the same whatever
+    # the size of the string table.
+    with open(path, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return _Snapshot(data).file()
+
+
+class _Snapshot:
+    # Reads a snapshot from an mmap or any other buffer.
+    __slots__ = ('string_offsets', 'segment_tags', 'segment_elements', 'element_components',
+                 'component_values', 'messages', 'interchanges', 'una', '_blob', '_strings')
+
+    def __init__(self, data: mmap.mmap | bytes):
+        if len(data) < _HEADER.size:
+            raise ValueError("not a yapep snapshot")
+        (magic, version, order, strings, blob_size, segments, elements, components,
+         messages, interchanges, self.una, _) = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("not a yapep snapshot")
+        if version != _VERSION:
+            raise ValueError(f"unsupported snapshot version {version}")
+        sizes = (strings + 1, segments, segments + 1, elements + 1, components, 4 * messages, 4 * interchanges)
+        end = _HEADER.size + 4 * sum(sizes)
+        if len(data) != end + blob_size:
+            raise ValueError("truncated yapep snapshot")
+        view = memoryview(data)
+        if order == _ORDER:
+            words = view[_HEADER.size:end].cast('I')
+        else:
+            words = array('I')
+            words.frombytes(view[_HEADER.size:end])
+            words.byteswap()
+        arrays = []
+        start = 0
+        for size in sizes:
+            arrays.append(words[start:start + size])
+            start += size
+        (self.string_offsets, self.segment_tags, self.segment_elements, self.element_components,
+         self.component_values, self.messages, self.interchanges) = arrays
+        self._blob = view[end:]
+        self._strings: List[str | None] = [None] * strings  # decoded on first use
+
+    def strings(self, numbers: List[int]) -> List[str]:
+        cache = self._strings
+        values = [cache[number] for number in numbers]
+        if None in values:
+            blob = self._blob
+            offsets = self.string_offsets
+            for k, number in enumerate(numbers):
+                if values[k] is None:
+                    values[k] = cache[number] = str(blob[offsets[number]:offsets[number + 1]],
+                                                    'utf-8', 'surrogatepass')
+        return values
+
+    def segments(self, first: int, end: int) -> List[Segment]:
+        # segments first..end-1, read from the arrays a slice at a time
+        if first == end:
+            return []
+        tags = self.strings(self.segment_tags[first:end].tolist())
+        bounds = self.segment_elements[first:end + 1].tolist()
+        components = self.element_components[bounds[0]:bounds[-1] + 1].tolist()
+        base = components[0]
+        values = self.strings(self.component_values[base:components[-1]].tolist())
+        segments = []
+        offset = bounds[0]
+        for k, tag in enumerate(tags):
+            elements = []
+            for element in range(bounds[k] - offset, bounds[k + 1] - offset):
+                elements.append(Element(list(map(Component, values[components[element] - base:
+                                                                   components[element + 1] - base]))))
+            segments.append(Segment(tag, elements))
+        return segments
+
+    def segment(self, number: int) -> Segment | None:
+        if number == _NONE:
+            return None
+        return self.segments(number, number + 1)[0]
+
+    def file(self, lazy: bool = True) -> File:
+        # lazy=False builds every message now, as a plain Message, and
+        # decodes the string table in one go since all of it is needed
+        if not lazy:
+            blob = bytes(self._blob)
+            offsets = self.string_offsets.tolist()
+            self._strings = [str(blob[start:end], 'utf-8', 'surrogatepass')
+                             for start, end in zip(offsets, offsets[1:])]
+        rows = self.interchanges
+        interchanges = []
+        for row in range(0, len(rows), 4):
+            header, first, end, trailer = rows[row:row + 4]
+            if lazy:
+                messages = [SnapshotMessage(self, number) for number in range(first, end)]
+            else:
+                messages = [self.message(number) for number in range(first, end)]
+            interchanges.append(Interchange(header=self.segment(header), messages=messages,
+                                            trailer=self.segment(trailer)))
+        return File(self.segment(self.una), interchanges)
+
+    def message(self, number: int) -> Message:
+        header, first, end, trailer = self.messages[4 * number:4 * number + 4]
+        return Message(header=self.segment(header), segments=self.segments(first, end),
+                       trailer=self.segment(trailer))
+
+
+class SnapshotMessage(Message):
+    # Message read from a snapshot; header, segments and trailer are built
+    # on first access. Compares equal to a Message with the same content.
+    __slots__ = ('_snapshot', '_number', '_header', '_segments', '_trailer')
+
+    def __init__(self, snapshot: _Snapshot, number: int):
+        self._snapshot = snapshot
+        self._number = number
+        self._header: Segment | None = None
+        self._segments: List[Segment] | None = None
+        self._trailer: Segment | None = None
+        self._index = None
+
+    @property
+    def header(self) -> Segment:
+        if self._header is None:
+            self._header = self._snapshot.segment(self._snapshot.messages[4 * self._number])
+        return self._header
+
+    @header.setter
+    def header(self, header: Segment):
+        self._header = header
+
+    @property
+    def segments(self) -> List[Segment]:
+        if self._segments is None:
+            first, end = self._snapshot.messages[4 * self._number + 1:4 * self._number + 3]
+            self._segments = self._snapshot.segments(first, end)
+        return self._segments
+
+    @segments.setter
+    def segments(self, segments: List[Segment]):
+        self._segments = segments
+
+    @property
+    def trailer(self) -> Segment | None:
+        if self._trailer is None:
+            self._trailer = self._snapshot.segment(self._snapshot.messages[4 * self._number + 3])
+        return self._trailer
+
+    @trailer.setter
+    def trailer(self, trailer: Segment | None):
+        self._trailer = trailer
+
+    def __eq__(self, other):
+        if isinstance(other, Message):
+            return (self.header, self.trailer, self.segments) == (other.header, other.trailer, other.segments)
+        return NotImplemented
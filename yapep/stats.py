@@ -0,0 +1,111 @@
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Iterator, List, TypeVar
+
+from .ast import Node, Visitor, Signal
+
+_T = TypeVar("_T")
+
+
+@dataclass(slots=True)
+class PhaseTime:
+    wall: float = 0.0  # seconds
+    cpu: float = 0.0  # seconds of process CPU time
+    calls: int = 0
+
+    def add(self, other: "PhaseTime"):
+        self.wall += other.wall
+        self.cpu += other.cpu
+        self.calls += other.calls
+
+
+# called with the phase name, the time of the run that just ended and the
+# stats it was added to
+Sink = Callable[[str, PhaseTime, "ParseStats"], None]
+
+
+@dataclass(slots=True)
+class ParseStats:
+    # Collected when passed as stats= to Tokenizer, StreamTokenizer or
+    # Parser, or through visit(). Phases are "tokenize", "parse" and
+    # "visit". bytes counts the input scanned (characters for str input);
+    # largest_message is in segments, UNH and UNT included.
+    phases: Dict[str, PhaseTime] = field(default_factory=dict)
+    bytes: int = 0
+    tokens: int = 0
+    escapes: int = 0
+    segments: int = 0
+    messages: int = 0
+    largest_message: int = 0
+    sinks: List[Sink] = field(default_factory=list)
+
+    def add_sink(self, sink: Sink):
+        self.sinks.append(sink)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            self._record(name, PhaseTime(time.perf_counter() - wall, time.process_time() - cpu, 1))
+
+    def timed(self, name: str, items: Iterable[_T]) -> Iterator[_T]:
+        # Times only the work done inside items, not the consumer's work
+        # between items; sinks hear about it once items is exhausted.
+        iterator = iter(items)
+        spent = PhaseTime(calls=1)
+        clock = time.perf_counter
+        cpu_clock = time.process_time
+        try:
+            while True:
+                wall = clock()
+                cpu = cpu_clock()
+                try:
+                    item = next(iterator)
+                finally:
+                    spent.wall += clock() - wall
+                    spent.cpu += cpu_clock() - cpu
+                yield item
+        except StopIteration:
+            return
+        finally:
+            self._record(name, spent)
+
+    def visit(self, node: Node, visitor: Visitor) -> Signal | None:
+        with self.phase("visit"):
+            return node.accept(visitor)
+
+    def add_message(self, segments: int):
+        # segments of one message, UNH and UNT included
+        self.messages += 1
+        if segments > self.largest_message:
+            self.largest_message = segments
+
+    def as_dict(self) -> dict:
+        return {
+            "phases": {name: {"wall": t.wall, "cpu": t.cpu, "calls": t.calls} for name, t in self.phases.items()},
+            "bytes": self.bytes, "tokens": self.tokens, "escapes": self.escapes, "segments": self.segments,
+            "messages": self.messages, "largest_message": self.largest_message,
+        }
+
+    def _record(self, name: str, spent: PhaseTime):
+        total = self.phases.get(name)
+        if total is None:
+            total = self.phases[name] = PhaseTime()
+        total.add(spent)
+        for sink in self.sinks:
+            sink(name, spent, self)
+
+
+def log_sink(logger: logging.Logger | None = None, level: int = logging.INFO) -> Sink:
+    # a sink writing one log record per finished phase
+    logger = logger or logging.getLogger("yapep")
+
+    def sink(name: str, spent: PhaseTime, stats: ParseStats):
+        logger.log(level, "%s: %.3fs wall, %.3fs cpu (%d tokens, %d segments, %d messages so far)",
+                   name, spent.wall, spent.cpu, stats.tokens, stats.segments, stats.messages)
+    return sink
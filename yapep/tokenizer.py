@@ -1,6 +1,42 @@
+import codecs
+import mmap
+import re
+from array import array
 from enum import Enum, auto
 from dataclasses import dataclass
-from typing import List
+from os import PathLike
+from typing import List, Dict, Iterable, Iterator, IO, NamedTuple, Sequence
+
+from .intern import InternPool
+from .stats import ParseStats
+
+
+_WHITESPACE = re.compile(r'\s')
+_NON_WHITESPACE = re.compile(r'\S')
+# ASCII characters for which str.isspace() is true
+_WHITESPACE_BYTES = re.compile(rb'[\t-\r\x1c-\x20]')
+_NON_WHITESPACE_BYTES = re.compile(rb'[^\t-\r\x1c-\x20]')
+_NON_ASCII_BYTES = re.compile(rb'[\x80-\xff]')
+_MAX_OFFSET = 0xFFFFFFFF  # TokenStream offsets are array('I')
+
+# Python codecs for the UNB syntax identifiers (UNB element 1, component 1).
+# UNOA and UNOB are subsets of ASCII, but partners send stray 8-bit bytes
+# under them; reading those as Latin-1 keeps a value instead of failing.
+CHARSETS = {
+    'UNOA': 'latin-1',
+    'UNOB': 'latin-1',
+    'UNOC': 'latin-1',
+    'UNOD': 'iso8859-2',
+    'UNOE': 'iso8859-5',
+    'UNOF': 'iso8859-7',
+    'UNOG': 'iso8859-3',
+    'UNOH': 'iso8859-4',
+    'UNOI': 'iso8859-6',
+    'UNOJ': 'iso8859-8',
+    'UNOK': 'iso8859-9',
+    'UNOW': 'utf-8',
+    'UNOY': 'utf-8',
+}
 
 
 class TokenType(Enum):
@@ -13,29 +49,167 @@ class TokenType(Enum):
     ESCAPE = auto()
 
 
-@dataclass
+@dataclass(slots=True)
 class Token:
     type: TokenType
     value: str
 
 
+_TOKEN_TYPES = [None] + list(TokenType)  # indexed by TokenType.value
+
+
+class Delimiters(NamedTuple):
+    # in the order they appear in a UNA header
+    component: str = ':'
+    element: str = '+'
+    decimal: str = '.'
+    release: str = '?'
+    repetition: str = ' '
+    terminator: str = '\''
+
+
+def detect_delimiters(data: str | bytes | mmap.mmap | memoryview, start: int = 0) -> Delimiters | None:
+    # Delimiters of the UNA header at the start of data, if there is one
+    binary = not isinstance(data, str)
+    first = (_NON_WHITESPACE_BYTES if binary else _NON_WHITESPACE).search(data, start)
+    if first is None:
+        return None
+    header = data[first.start():first.start() + 9]
+    if binary:
+        header = str(header, 'latin-1')
+    if not header.startswith("UNA"):
+        return None
+    if len(header) < 9:
+        raise ValueError(f"truncated UNA header: {header!r}")
+    return Delimiters(*header[3:9])
+
+
+class TokenStream:
+    # Token types are stored as TokenType values in an array('B') and token
+    # values as (start, end) offsets into the source, so a value only becomes
+    # a str when it is asked for. Values that are not a plain slice of the
+    # source (escaped or whitespace-stripped text) are kept in _values, with
+    # the span of the segment they come from. A bytes-like source is decoded
+    # value by value with encoding.
+    def __init__(self, source: str | bytes | mmap.mmap | memoryview, encoding: str | None = None):
+        self.source = source
+        self.encoding = encoding
+        self.types = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+        self._values: Dict[int, str] = {}
+
+    def append(self, type: TokenType, start: int, end: int):
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def append_value(self, type: TokenType, value: str, start: int = 0, end: int = 0):
+        self._values[len(self.types)] = value
+        self.append(type, start, end)
+
+    def type(self, index: int) -> TokenType:
+        return _TOKEN_TYPES[self.types[index]]
+
+    def value(self, index: int) -> str:
+        if index in self._values:
+            return self._values[index]
+        if self.encoding is not None:
+            return str(self.source[self.starts[index]:self.ends[index]], self.encoding)
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self.types)
+        return Token(_TOKEN_TYPES[self.types[index]], self.value(index))
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self.types)):
+            yield Token(_TOKEN_TYPES[self.types[index]], self.value(index))
+
+
 class Tokenizer:
-    def __init__(self, data: str):
-        self._raw_data = data.strip()
-        self._component_sep = ':'
-        self._element_sep = '+'
-        self._segment_terminator = '\''
-        self._release_char = '?'
+    def __init__(self, data: str | bytes | mmap.mmap | memoryview, encoding: str | None = None,
+                 delimiters: Delimiters | None = None, stats: ParseStats | None = None,
+                 pool: InternPool | None = None):
+        # Raw bytes are scanned in place: _start and _end skip the surrounding
+        # whitespace instead of stripping a copy, and values are decoded with
+        # encoding, or with the charset of the first UNB when it is None.
+        # With stats, tokenizing is timed and counted (see yapep.stats). With
+        # pool, tags and values of Token lists are interned; a TokenStream
+        # slices its values on demand, so pass the pool to the Parser instead.
+        self._binary = not isinstance(data, str)
+        self._size = len(data)  # counted as stats.bytes, whitespace included
+        if self._binary:
+            first = _NON_WHITESPACE_BYTES.search(data)
+            self._raw_data = data
+            self._start = first.start() if first else len(data)
+            self._end = len(data)
+            while self._end > self._start and _WHITESPACE_BYTES.fullmatch(data[self._end - 1:self._end]):
+                self._end -= 1
+        else:
+            self._raw_data = data.strip()
+            self._start = 0
+            self._end = len(self._raw_data)
+        self._encoding = encoding
+        self.delimiters = delimiters or Delimiters()
         self._tokens: List[Token] = []
+        self._buffer = ''  # text of the segment being scanned
+        self.stats = stats
+        self._una_escapes = 0  # ESCAPE tokens of a UNA header not counted yet
+        self._intern = pool.string if pool is not None else None
+        self._mapping: mmap.mmap | None = None  # owned by from_path, closed by close()
+
+    @classmethod
+    def from_buffer(cls, buffer: bytes | bytearray | mmap.mmap | memoryview,
+                    encoding: str | None = None, delimiters: Delimiters | None = None,
+                    stats: ParseStats | None = None, pool: InternPool | None = None) -> "Tokenizer":
+        return cls(buffer, encoding, delimiters, stats, pool)
+
+    @classmethod
+    def from_path(cls, path: str | PathLike, encoding: str | None = None,
+                  delimiters: Delimiters | None = None, stats: ParseStats | None = None,
+                  pool: InternPool | None = None) -> "Tokenizer":
+        # The file stays mapped until close(): a TokenStream slices its values
+        # out of the mapping, so read them before closing the tokenizer.
+        data = map_file(path)
+        tokenizer = cls(data, encoding, delimiters, stats, pool)
+        if isinstance(data, mmap.mmap):
+            tokenizer._mapping = data
+        return tokenizer
+
+    def close(self):
+        if self._mapping is not None:
+            self._mapping.close()
+            self._mapping = None
+
+    def __enter__(self) -> "Tokenizer":
+        return self
+
+    def __exit__(self, *exc_info):
+        # StreamTokenizer.close() drains its buffer instead
+        Tokenizer.close(self)
+
+    @property
+    def delimiters(self) -> Delimiters:
+        return Delimiters(self._component_sep, self._element_sep, self._decimal_mark,
+                          self._release_char, self._repetition_sep, self._segment_terminator)
+
+    @delimiters.setter
+    def delimiters(self, delimiters: Delimiters):
+        (self._component_sep, self._element_sep, self._decimal_mark,
+         self._release_char, self._repetition_sep, self._segment_terminator) = delimiters
 
-    def _init_delimiters(self):
-        if self._raw_data.startswith("UNA"):
-            self._component_sep = self._raw_data[3]
-            self._element_sep = self._raw_data[4]
-            self._release_char = self._raw_data[6]
-            self._segment_terminator = self._raw_data[8]
+    def _init_delimiters(self) -> int:
+        una = detect_delimiters(self._raw_data, self._start)
+        if una is not None:
+            self.delimiters = una
+            self._una_escapes = 1
             self._tokens.append(Token(TokenType.SEGMENT_TAG, "UNA"))
-            for i, char in enumerate(self._raw_data[3:9]):
+            for i, char in enumerate(una):
                 if i == 0:
                     self._tokens.append(Token(TokenType.COMPONENT_SEPARATOR, char))
                 elif i == 1:
@@ -48,44 +222,380 @@ class Tokenizer:
                     self._tokens.append(Token(TokenType.ELEMENT_DATA, char))  # repetition sep
                 elif i == 5:
                     self._tokens.append(Token(TokenType.SEGMENT_TERMINATOR, char))
-            self._raw_data = self._raw_data[9:].lstrip()
+            return self._start + 9
+        return self._start
 
     def tokenize(self):
-        self._init_delimiters()
-        buffer = ''
-        i = 0
-        length = len(self._raw_data)
+        if self.stats is None:
+            return self._tokenize()
+        with self.stats.phase("tokenize"):
+            tokens = self._tokenize()
+            self._count(self._size, [token.type.value for token in tokens])
+        return tokens
+
+    def tokenize_stream(self) -> TokenStream:
+        if self.stats is None:
+            return self._tokenize_stream()
+        with self.stats.phase("tokenize"):
+            stream = self._tokenize_stream()
+            self._count(self._size, stream.types)
+        return stream
+
+    def _count(self, size: int, codes: Sequence[int]):
+        # The release character of a UNA header comes out as an ESCAPE token
+        # too; it is not an escape in the data.
+        stats = self.stats
+        stats.bytes += size
+        stats.tokens += len(codes)
+        stats.escapes += codes.count(TokenType.ESCAPE.value) - self._una_escapes
+        self._una_escapes = 0
+
+    def _tokenize(self) -> List[Token]:
+        if self._binary:
+            self._tokens = list(self._tokenize_stream())
+            return self._tokens
+        start = self._init_delimiters()
+        self._scan(self._raw_data, start, self._end, True)
+        self._flush()
+        return self._tokens
+
+    def _tokenize_stream(self) -> TokenStream:
+        data = self._raw_data
+        if self._end > _MAX_OFFSET:
+            raise ValueError(f"input of {self._end} bytes is too large for a TokenStream (4 GiB at most); "
+                             f"use iter_tokens, parse_parallel or open_indexed instead")
+        stream = TokenStream(data, self._encoding or ('latin-1' if self._binary else None))
+        start = self._init_delimiters()
+        for k, token in enumerate(self._tokens):  # UNA header
+            if k == 0:
+                stream.append(token.type, self._start, self._start + 3)
+            else:
+                stream.append(token.type, self._start + k + 2, self._start + k + 3)
+        self._tokens = []
+        self._scan_spans(data, start, self._end, stream)
+        return stream
+
+    def _scan(self, data: str, i: int, length: int, final: bool) -> int:
+        # Scans data[i:length] and returns the index of the first character
+        # left unconsumed. Segments without a release character are split in
+        # bulk; the others go through the character by character scan.
+        terminator = self._segment_terminator
+        release = self._release_char
         while i < length:
-            char = self._raw_data[i]
-            if char == self._release_char and i + 1 < length:
-                buffer += self._raw_data[i + 1]
-                self._tokens.append(Token(TokenType.ESCAPE, self._release_char))
-                i += 2
+            end = data.find(terminator, i, length)
+            stop = length if end == -1 else end
+            if data.find(release, i, stop) != -1:
+                j = self._scan_slow(data, i, length, final, once=True)
+                if j == i:
+                    break  # release character kept back for the next chunk
+                i = j
                 continue
+
+            piece = data[i:stop]
+            if _WHITESPACE.search(piece):
+                piece = ''.join(piece.split())
+            if self._buffer:
+                piece = self._buffer + piece
+            if end == -1:
+                self._buffer = piece
+                return length
+            if piece:
+                self._split_segment(piece.strip())
+            self._buffer = ''
+            self._tokens.append(Token(TokenType.SEGMENT_TERMINATOR, terminator))
+            i = end + 1
+        return i
+
+    def _scan_spans(self, data, i: int, length: int, stream: TokenStream):
+        # Same segmentation as _scan, but records offsets instead of building
+        # tokens. Segments with release characters or inner whitespace are
+        # scanned as text and their values stored as-is. Raw bytes are split
+        # at the byte level; the delimiters are single-byte in every charset.
+        binary = self._binary
+        terminator = self._segment_terminator
+        release = self._release_char
+        element_sep = self._element_sep
+        component_sep = self._component_sep
+        whitespace = _WHITESPACE
+        non_whitespace = _NON_WHITESPACE
+        if binary:
+            terminator = terminator.encode('latin-1')
+            release = release.encode('latin-1')
+            element_sep = element_sep.encode('latin-1')
+            component_sep = component_sep.encode('latin-1')
+            whitespace = _WHITESPACE_BYTES
+            non_whitespace = _NON_WHITESPACE_BYTES
+        find = _view_find(data) if isinstance(data, memoryview) else data.find
+        detect_charset = binary and self._encoding is None
+        types = stream.types.append
+        starts = stream.starts.append
+        ends = stream.ends.append
+        tag_code = TokenType.SEGMENT_TAG.value
+        element_code = TokenType.ELEMENT_SEPARATOR.value
+        component_code = TokenType.COMPONENT_SEPARATOR.value
+        data_code = TokenType.COMPONENT_DATA.value
+        terminator_code = TokenType.SEGMENT_TERMINATOR.value
+        while i < length:
+            end = find(terminator, i, length)
+            stop = length if end == -1 else end
+            first = non_whitespace.search(data, i, stop)
+            if first is None:
+                if end == -1:
+                    break
+                types(terminator_code)
+                starts(end)
+                ends(end + 1)
+                i = end + 1
+                continue
+
+            s = first.start()
+            if (find(release, s, stop) != -1 or whitespace.search(data, s, stop)
+                    or binary and _NON_ASCII_BYTES.search(data, s, stop)
+                    and _WHITESPACE.search(str(data[s:stop], stream.encoding))):
+                if binary:
+                    j = self._segment_end(data, find, i, length)
+                    text = str(data[i:j], stream.encoding)
+                    self._scan_slow(text, 0, len(text), True, once=True)
+                else:
+                    j = self._scan_slow(data, i, length, True, once=True)
+                self._flush()
+                if detect_charset and self._detect_charset(stream):
+                    detect_charset = False
+                for token in self._tokens:
+                    stream.append_value(token.type, token.value, s, j)
+                self._tokens.clear()
+                i = j
+                continue
+
+            piece = data[s:stop]
+            if binary and type(piece) is not bytes:
+                piece = bytes(piece)
+            parts = piece.split(element_sep)
+            if detect_charset and parts[0] == b'UNB' and len(parts) > 1:
+                syntax = str(parts[1].split(component_sep)[0], 'latin-1')
+                stream.encoding = CHARSETS.get(syntax, stream.encoding)
+                detect_charset = False
+            pos = s + len(parts[0])
+            types(tag_code)
+            starts(s)
+            ends(pos)
+            for element in parts[1:]:
+                types(element_code)
+                starts(pos)
+                pos += 1
+                ends(pos)
+                if component_sep in element:
+                    for j, comp in enumerate(element.split(component_sep)):
+                        if j:
+                            types(component_code)
+                            starts(pos)
+                            pos += 1
+                            ends(pos)
+                        types(data_code)
+                        starts(pos)
+                        pos += len(comp)
+                        ends(pos)
+                else:
+                    types(data_code)
+                    starts(pos)
+                    pos += len(element)
+                    ends(pos)
+            if end != -1:
+                types(terminator_code)
+                starts(end)
+                ends(end + 1)
+            i = stop + 1
+
+    def _segment_end(self, data, find, i: int, length: int) -> int:
+        # Index just past the first terminator in data[i:length] that is not
+        # escaped, i.e. not preceded by an odd run of release characters.
+        terminator = self._segment_terminator.encode('latin-1')
+        release = ord(self._release_char)
+        while True:
+            end = find(terminator, i, length)
+            if end == -1:
+                return length
+            k = end
+            while k > i and data[k - 1] == release:
+                k -= 1
+            if (end - k) % 2 == 0:
+                return end + 1
+            i = end + 1
+
+    def _detect_charset(self, stream: TokenStream) -> bool:
+        # UNB found among the tokens of a segment scanned as text
+        tokens = self._tokens
+        for k, token in enumerate(tokens):
+            if token.type == TokenType.SEGMENT_TAG:
+                if token.value != "UNB":
+                    return False
+                for data in tokens[k + 1:]:
+                    if data.type == TokenType.COMPONENT_DATA:
+                        stream.encoding = CHARSETS.get(data.value, stream.encoding)
+                        return True
+                return True
+        return False
+
+    def _scan_slow(self, data: str, i: int, length: int, final: bool, once: bool = False) -> int:
+        # Unless final, a trailing release character is kept back because the
+        # character it escapes has not been seen yet. With once, scanning stops
+        # after the first segment terminator.
+        buffer = self._buffer
+        while i < length:
+            char = data[i]
+            if char == self._release_char:
+                if i + 1 < length:
+                    buffer += data[i + 1]
+                    self._tokens.append(Token(TokenType.ESCAPE, self._release_char))
+                    i += 2
+                    continue
+                if not final:
+                    break
             if char == self._segment_terminator:
                 if buffer:
-                    self._split_segment(buffer.strip())
+                    self._split_segment(buffer)
                     buffer = ''
                 self._tokens.append(Token(TokenType.SEGMENT_TERMINATOR, char))
                 i += 1
+                if once:
+                    break
             elif char.isspace():
                 i += 1
             else:
                 buffer += char
                 i += 1
-        if buffer:
-            self._split_segment(buffer.strip())
-        return self._tokens
+        self._buffer = buffer
+        return i
+
+    def _flush(self):
+        if self._buffer:
+            self._split_segment(self._buffer)
+            self._buffer = ''
 
     def _split_segment(self, text: str):
-        parts = text.split(self._element_sep)
+        append = self._tokens.append
+        element_sep = self._element_sep
+        component_sep = self._component_sep
+        intern = self._intern
+        parts = text.split(element_sep)
         if not parts:
             return
-        self._tokens.append(Token(TokenType.SEGMENT_TAG, parts[0].strip()))
+        tag = parts[0].strip()
+        append(Token(TokenType.SEGMENT_TAG, tag if intern is None else intern(tag)))
         for element in parts[1:]:
-            self._tokens.append(Token(TokenType.ELEMENT_SEPARATOR, self._element_sep))
-            components = element.split(self._component_sep)
+            append(Token(TokenType.ELEMENT_SEPARATOR, element_sep))
+            if component_sep not in element:
+                append(Token(TokenType.COMPONENT_DATA, element if intern is None else intern(element)))
+                continue
+            components = element.split(component_sep)
+            last = len(components) - 1
             for j, comp in enumerate(components):
-                self._tokens.append(Token(TokenType.COMPONENT_DATA, comp))
-                if j < len(components) - 1:
-                    self._tokens.append(Token(TokenType.COMPONENT_SEPARATOR, self._component_sep))
+                append(Token(TokenType.COMPONENT_DATA, comp if intern is None else intern(comp)))
+                if j < last:
+                    append(Token(TokenType.COMPONENT_SEPARATOR, component_sep))
+
+
+class StreamTokenizer(Tokenizer):
+    def __init__(self, stats: ParseStats | None = None, pool: InternPool | None = None):
+        super().__init__('', stats=stats, pool=pool)
+        self._pending = ''  # fed text that could not be scanned yet
+        self._started = False  # UNA detection done
+
+    def feed(self, chunk: str) -> List[Token]:
+        self._pending += chunk
+        if self.stats is None:
+            return self._drain(False)
+        with self.stats.phase("tokenize"):
+            size = len(self._pending)
+            tokens = self._drain(False)
+            self._count(size - len(self._pending), [token.type.value for token in tokens])
+        return tokens
+
+    def close(self) -> List[Token]:
+        if self.stats is None:
+            return self._drain(True)
+        with self.stats.phase("tokenize"):
+            size = len(self._pending)
+            tokens = self._drain(True)
+            self._count(size, [token.type.value for token in tokens])
+        return tokens
+
+    def _drain(self, final: bool) -> List[Token]:
+        data = self._pending
+        start = 0
+        if not self._started:
+            data = data.lstrip()
+            if not final and (not data or len(data) < 9 and "UNA".startswith(data[:3])):
+                # not enough text yet to tell whether a UNA header is present
+                self._pending = data
+                return []
+            self._raw_data = data
+            start = self._init_delimiters()
+            self._started = True
+
+        # trailing whitespace is only scanned once something follows it, so
+        # whitespace at the very end of the input is dropped like strip() does
+        length = len(data)
+        while length > start and data[length - 1].isspace():
+            length -= 1
+
+        i = self._scan(data, start, length, final)
+        if final:
+            self._pending = ''
+            self._flush()
+        else:
+            self._pending = data[i:]
+        tokens = self._tokens
+        self._tokens = []
+        return tokens
+
+
+def map_file(path: str | PathLike) -> mmap.mmap | bytes:
+    with open(path, 'rb') as f:
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty files cannot be mapped
+            return b''
+
+
+def _view_find(view: memoryview):
+    # memoryview has no find(); search it with a compiled pattern instead
+    patterns = {}
+
+    def find(sub: bytes, start: int, end: int) -> int:
+        if sub not in patterns:
+            patterns[sub] = re.compile(re.escape(sub))
+        match = patterns[sub].search(view, start, end)
+        return match.start() if match else -1
+
+    return find
+
+
+def _read_chunks(fileobj: IO, chunk_size: int) -> Iterator:
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+def _text_chunks(source: IO | Iterable, chunk_size: int, encoding: str) -> Iterator[str]:
+    # str chunks from a file-like object or an iterable of str/bytes chunks
+    chunks = _read_chunks(source, chunk_size) if hasattr(source, 'read') else source
+    decoder = None
+    for chunk in chunks:
+        if not isinstance(chunk, str):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)()
+            chunk = decoder.decode(chunk)
+        yield chunk
+    if decoder is not None:
+        yield decoder.decode(b'', final=True)
+
+
+def iter_tokens(source: IO | Iterable, chunk_size: int = 1 << 16, encoding: str = 'latin-1',
+                pool: InternPool | None = None) -> Iterator[Token]:
+    tokenizer = StreamTokenizer(pool=pool)
+    for chunk in _text_chunks(source, chunk_size, encoding):
+        yield from tokenizer.feed(chunk)
+    yield from tokenizer.close()
@@ -0,0 +1,191 @@
+import io
+import re
+from typing import IO, List
+
+from .ast import Node, File, Interchange, Message, Segment, Element, Component
+from .tokenizer import Delimiters, CHARSETS
+
+# Messages are first joined with these control characters in place of the
+# delimiters, so the values of a whole message are checked for characters
+# that need escaping with one regex search, and the real delimiters are put
+# in with str.replace. They count as whitespace to the Tokenizer, so values
+# hardly ever contain them; one that does would turn into delimiters, so
+# the placeholders of each message are counted against its structure and
+# a mismatch raises ValueError.
+_TERMINATOR = '\x1e'
+_ELEMENT = '\x1d'
+_COMPONENT = '\x1f'
+# The Tokenizer drops whitespace it finds unreleased, so values keep theirs
+# only when it is released. No character above U+3000 is whitespace.
+_WHITESPACE = [char for char in map(chr, range(0x3001))
+               if char.isspace() and char not in (_TERMINATOR, _ELEMENT, _COMPONENT)]
+
+
+class Writer:
+    # Serializes AST nodes back to EDIFACT. Output is collected as text and
+    # handed to the sink in writes of about buffer_size characters; a sink
+    # that is not an io.TextIOBase gets bytes in encoding, or in the charset
+    # of the current UNB when encoding is None. UNT segment counts and UNZ
+    # message counts are always recomputed. newline is written after every
+    # segment terminator. una=None writes a UNA header only when the File
+    # had one or the delimiters are not the defaults.
+    def __init__(self, sink: IO, delimiters: Delimiters | None = None, encoding: str | None = None,
+                 newline: str = '', buffer_size: int = 1 << 16, una: bool | None = None):
+        self.sink = sink
+        self.delimiters = delimiters or Delimiters()
+        self.encoding = encoding
+        self.newline = newline
+        self.buffer_size = buffer_size
+        self.una = una
+        self._binary = not isinstance(sink, io.TextIOBase)
+        self._charset = encoding or 'latin-1'
+        self._parts: List[str] = []
+        self._size = 0
+        self._started = False  # anything written yet
+        self._header: Segment | None = None  # UNB of the open interchange
+        self._messages = 0  # messages written in the open interchange
+
+        component, element, _, release, repetition, terminator = self.delimiters
+        special = ''.join(dict.fromkeys([release, terminator, element, component, repetition, *_WHITESPACE]))
+        self._escapes = {ord(char): release + char for char in special}
+        self._special = re.compile('[' + re.escape(special) + ']').search
+        self._element = element
+        self._component = component
+        self._end = terminator + newline
+
+    def write(self, node: Node):
+        if isinstance(node, File):
+            self.write_file(node)
+        elif isinstance(node, Interchange):
+            self.write_interchange(node)
+        elif isinstance(node, Message):
+            self.write_message(node)
+        elif isinstance(node, Segment):
+            self.write_segment(node)
+        else:
+            raise TypeError(f"cannot write {type(node).__name__}")
+
+    def write_file(self, file: File):
+        if file.una is not None and self.una is None and not self._started:
+            self._write_una()
+        for interchange in file.interchanges:
+            self.write_interchange(interchange)
+
+    def write_interchange(self, interchange: Interchange):
+        self.start_interchange(interchange.header)
+        for message in interchange.messages:
+            self.write_message(message)
+        self.end_interchange(interchange.trailer)
+
+    def start_interchange(self, header: Segment):
+        if self._header is not None:
+            raise ValueError("interchange already open")
+        if self.encoding is None:
+            charset = _charset(header)
+            if charset != self._charset:
+                self.flush()
+                self._charset = charset
+        self._header = header
+        self._messages = 0
+        self.write_segment(header)
+
+    def end_interchange(self, trailer: Segment | None = None):
+        # Writes the UNZ with the message count and the control reference of
+        # the UNB; any further elements of trailer are kept.
+        if self._header is None:
+            raise ValueError("no open interchange")
+        reference = _value(self._header, 4)
+        extra = trailer.elements[2:] if trailer is not None else []
+        self._append(self._text([self._service("UNZ", str(self._messages), reference, extra)]))
+        self._header = None
+
+    def write_message(self, message: Message):
+        if not self._started:
+            self._start()
+        segments = message.segments
+        trailer = message.trailer
+        extra = trailer.elements[2:] if trailer is not None else []
+        unt = self._service("UNT", str(len(segments) + 2), _value(message.header, 0), extra)
+        self._append(self._text([message.header, *segments, unt]))
+        self._messages += 1
+
+    def write_segment(self, segment: Segment):
+        if not self._started:
+            self._start()
+        self._append(self._text([segment]))
+
+    def flush(self):
+        if self._parts:
+            text = ''.join(self._parts)
+            self._parts = []
+            self._size = 0
+            self.sink.write(text.encode(self._charset) if self._binary else text)
+
+    def close(self):
+        if self._header is not None:
+            self.end_interchange()
+        self.flush()
+
+    def __enter__(self) -> "Writer":
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+        else:
+            self.flush()
+
+    def _start(self):
+        self._started = True
+        if self.una or (self.una is None and self.delimiters != Delimiters()):
+            self._write_una()
+
+    def _write_una(self):
+        self._started = True
+        self._append("UNA" + ''.join(self.delimiters) + self.newline)
+
+    def _service(self, tag: str, count: str, reference: str, extra: List[Element]) -> Segment:
+        return Segment(tag, [Element([Component(count)]), Element([Component(reference)])] + extra)
+
+    def _text(self, segments: List[Segment]) -> str:
+        # segments joined with the placeholders, then escaped and given the
+        # real delimiters. The placeholders put in are counted along the way;
+        # values holding one make the count in the joined text come out higher.
+        parts = []
+        placeholders = len(segments)  # terminators
+        for segment in segments:
+            elements = segment.elements
+            placeholders += len(elements)
+            values = [segment.tag]
+            for element in elements:
+                components = element.components
+                if len(components) == 1:
+                    values.append(components[0].value)
+                else:
+                    if components:
+                        placeholders += len(components) - 1
+                    values.append(_COMPONENT.join([component.value for component in components]))
+            parts.append(_ELEMENT.join(values))
+        raw = _TERMINATOR.join(parts) + _TERMINATOR
+        if raw.count(_ELEMENT) + raw.count(_COMPONENT) + raw.count(_TERMINATOR) != placeholders:
+            raise ValueError("cannot write values containing the control characters \\x1d, \\x1e or \\x1f")
+        if self._special(raw):
+            raw = raw.translate(self._escapes)
+        return raw.replace(_ELEMENT, self._element).replace(_COMPONENT, self._component) \
+            .replace(_TERMINATOR, self._end)
+
+    def _append(self, text: str):
+        self._parts.append(text)
+        self._size += len(text)
+        if self._size >= self.buffer_size:
+            self.flush()
+
+
+def _value(segment: Segment | None, element: int) -> str:
+    if segment is not None and len(segment.elements) > element and segment.elements[element].components:
+        return segment.elements[element].components[0].value
+    return ''
+
+
+def _charset(header: Segment) -> str:
+    return CHARSETS.get(_value(header, 0), 'latin-1')